@@ -0,0 +1,86 @@
+# benchmarks/grouping_benchmark.py
+#
+# Compare the local import-graph grouping with the GPT project summary on a
+# checked-out project:
+#
+#   python -m benchmarks.grouping_benchmark path/to/project [--llm]
+#
+# Quality is measured as import-edge coverage: the share of resolved imports
+# whose two files land in the same group. Higher means more of each file's
+# dependencies are visible to GPT in the same request.
+
+import argparse
+import asyncio
+import os
+import time
+
+from utils.constants import JUNK_FOLDERS
+from utils.file_extractor import is_code_file, is_valid_code_file
+from services.import_graph import build_dependency_graph, group_files
+from services.project_summary import get_project_summary, parse_project_summary
+
+
+def collect_previews(root):
+    file_previews = []
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in JUNK_FOLDERS]
+        for name in files:
+            full_path = os.path.join(dirpath, name)
+            if is_code_file(full_path) and is_valid_code_file(full_path):
+                with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
+                    preview = f.read(500)
+                file_previews.append({
+                    "filename": full_path,
+                    "display_name": os.path.relpath(full_path, start=root).replace("\\", "/"),
+                    "original_name": name,
+                    "preview": preview
+                })
+    return file_previews
+
+
+def edge_coverage(dependencies, connected_groups):
+    group_of = {}
+    for i, group in enumerate(connected_groups):
+        for path in group:
+            group_of[path] = i
+
+    edges = [(src, dst) for src, deps in dependencies.items() for dst in deps]
+    if not edges:
+        return 1.0
+    covered = sum(1 for src, dst in edges if src in group_of and group_of.get(src) == group_of.get(dst))
+    return covered / len(edges)
+
+
+def report(label, elapsed, dependencies, connected_groups, total_files):
+    grouped = {path for group in connected_groups for path in group}
+    sizes = [len(group) for group in connected_groups] or [0]
+    print(f"\n== {label} ==")
+    print(f"latency:        {elapsed * 1000:.1f} ms")
+    print(f"groups:         {len(connected_groups)} (max size {max(sizes)}, avg {sum(sizes) / len(sizes):.1f})")
+    print(f"files grouped:  {len(grouped)}/{total_files}")
+    print(f"edge coverage:  {edge_coverage(dependencies, connected_groups):.1%}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("root")
+    parser.add_argument("--llm", action="store_true", help="also time the GPT project summary (costs tokens)")
+    args = parser.parse_args()
+
+    file_previews = collect_previews(args.root)
+    print(f"{len(file_previews)} code files under {args.root}")
+
+    start = time.perf_counter()
+    dependencies, local_groups = group_files(file_previews)
+    report("local import graph", time.perf_counter() - start, dependencies, local_groups, len(file_previews))
+
+    if args.llm:
+        start = time.perf_counter()
+        summary_text = await get_project_summary(file_previews)
+        _, llm_groups = parse_project_summary(summary_text)
+        elapsed = time.perf_counter() - start
+        report("GPT project summary", elapsed, build_dependency_graph(file_previews), llm_groups, len(file_previews))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+# benchmarks/login_benchmark.py
+#
+# Login latency with and without concurrent uploads being analysed in the same
+# API process:
+#
+#   LLM_BACKEND=fake python -m benchmarks.login_benchmark --logins 400 --concurrency 32 --uploads 4
+#
+# Requests go through the real app (httpx ASGI transport) against MONGO_URI.
+# A throwaway project, its user and its uploads are removed afterwards unless
+# --keep is given. With bcrypt in the password pool, p99 under load should stay
+# close to the idle p99.
+
+import os
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("ANALYSIS_EXECUTOR", "inline")
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+import httpx
+from datetime import datetime, timezone
+
+from db.models import db
+from db import repository
+from main import app
+from utils.auth_utils import shutdown_password_pool
+from utils.metrics import snapshot
+
+
+def sample_files(count):
+    files = []
+    for i in range(count):
+        source = f"import os\n\n\ndef handler_{i}(path):\n    return open(os.path.join(path, 'f{i}.txt')).read()\n"
+        files.append(("files", (f"bench/module_{i}.py", source.encode("utf-8"), "text/x-python")))
+    return files
+
+
+async def login_latencies(client, credentials, count, concurrency):
+    latencies = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with slots:
+            start = time.perf_counter()
+            response = await client.post("/login", json=credentials)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    await asyncio.gather(*(login() for _ in range(count)))
+    return sorted(latencies)
+
+
+async def keep_uploading(client, token, files_per_upload, upload_ids, stop):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        response = await client.post("/upload/", headers=headers, files=sample_files(files_per_upload), data={"grouping_mode": "local"})
+        response.raise_for_status()
+        upload_id = response.json()["upload_id"]
+        upload_ids.append(upload_id)
+        while not stop.is_set():
+            status = (await client.get(f"/upload/{upload_id}/status", headers=headers)).json()
+            if status.get("status") in ("done", "completed_with_errors", "failed"):
+                break
+            await asyncio.sleep(0.2)
+
+
+def report(label, latencies):
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(f"[LoginBenchmark] {label:<14} p50 {statistics.median(latencies) * 1000:7.1f}ms  "
+          f"p99 {p99 * 1000:7.1f}ms  max {latencies[-1] * 1000:7.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--uploads", type=int, default=4, help="uploads analysed concurrently during the loaded run")
+    parser.add_argument("--files-per-upload", type=int, default=40)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark's project, user and uploads")
+    args = parser.parse_args()
+
+    project_id = await repository.insert_project({
+        "project_name": f"login-bench-{uuid.uuid4()}",
+        "created_at": datetime.now(timezone.utc)
+    })
+    credentials = {"username": "bench", "password": "bench-password", "project_id": str(project_id), "role": "developer"}
+    upload_ids = []
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        try:
+            (await client.post("/register", json=credentials)).raise_for_status()
+            login = await client.post("/login", json=credentials)  # also starts the password pool
+            token = login.json()["token"]
+
+            report("idle", await login_latencies(client, credentials, args.logins, args.concurrency))
+
+            stop = asyncio.Event()
+            uploaders = [
+                asyncio.create_task(keep_uploading(client, token, args.files_per_upload, upload_ids, stop))
+                for _ in range(args.uploads)
+            ]
+            await asyncio.sleep(1)
+            loaded = await login_latencies(client, credentials, args.logins, args.concurrency)
+            stop.set()
+            await asyncio.gather(*uploaders, return_exceptions=True)
+            report(f"{args.uploads} uploads", loaded)
+            print(f"[LoginBenchmark] {len(upload_ids)} uploads started during the loaded run")
+            print(snapshot()["timings"].get("auth.password_seconds"))
+        finally:
+            if not args.keep:
+                db["users"].delete_many({"project_id": project_id})
+                db["projects"].delete_one({"_id": project_id})
+                for collection_name in ("file_analysis", "uploads", "jobs"):
+                    db[collection_name].delete_many({"upload_id": {"$in": upload_ids}})
+            shutdown_password_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+# benchmarks/pipeline_benchmark.py
+#
+# Run the full analysis pipeline on a local project without paying for LLM
+# calls:
+#
+#   LLM_BACKEND=fake python -m benchmarks.pipeline_benchmark path/to/project
+#   LLM_BACKEND=replay LLM_REPLAY_LATENCY=true python -m benchmarks.pipeline_benchmark path/to/project
+#
+# Results are written to MongoDB under a throwaway project id and removed
+# afterwards unless --keep is given.
+
+import argparse
+import asyncio
+import time
+import uuid
+from bson import ObjectId
+
+from benchmarks.grouping_benchmark import collect_previews
+from db.models import file_analysis_collection
+from routes.upload import run_analysis_task
+from services.import_graph import group_files
+from services.llm_scheduler import set_upload_context
+from utils.metrics import snapshot
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("root")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark's analysis documents")
+    args = parser.parse_args()
+
+    file_previews = collect_previews(args.root)
+    _, groups = group_files(file_previews)
+    display_to_full = {f["display_name"]: f["filename"] for f in file_previews}
+    groups = [[display_to_full[name] for name in group] for group in groups]
+
+    upload_id = f"bench-{uuid.uuid4()}"
+    project_id = str(ObjectId())
+    set_upload_context(upload_id)
+
+    start = time.perf_counter()
+    await run_analysis_task(upload_id, groups, file_previews, str(ObjectId()), "benchmark", project_id, "pipeline benchmark")
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{len(file_previews)} files in {len(groups)} groups analysed in {elapsed:.2f}s")
+    print(snapshot())
+
+    if not args.keep:
+        file_analysis_collection.delete_many({"upload_id": upload_id})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
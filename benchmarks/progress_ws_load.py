@@ -0,0 +1,149 @@
+# benchmarks/progress_ws_load.py
+#
+# Load test for /ws/progress/{upload_id}: one API process (in-process uvicorn,
+# memory progress bus) serving many sockets while a simulated analysis
+# publishes progress for their upload.
+#
+#   ulimit -n 65536
+#   python -m benchmarks.progress_ws_load --clients 10000 --client-procs 8
+#
+# The simulated analysis is first run with no sockets connected, then with all
+# of them; the report compares its wall time, the worst event-loop lag seen
+# while it ran, and how long after the final "DONE" event the clients got it.
+# Clients run in separate processes so they don't share the server's loop.
+
+import os
+os.environ["PROGRESS_BUS_BACKEND"] = "memory"
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+import uvicorn
+import websockets
+from fastapi import FastAPI
+
+from routes.progress_ws import router as progress_ws_router
+from services.progress_bus import publish_progress
+from utils.metrics import snapshot
+
+UPLOAD_ID = "bench-progress"
+
+
+async def run_clients(url, count, ready, results):
+    done_at = []
+    received = [0]
+
+    async def client():
+        connected = False
+        try:
+            async with websockets.connect(url, open_timeout=60, ping_interval=None, max_queue=None) as ws:
+                connected = True
+                ready.put(1)
+                async for message in ws:
+                    received[0] += 1
+                    if json.loads(message).get("status", "").startswith("DONE"):
+                        done_at.append(time.time())
+                        return
+        except Exception as e:
+            if not connected:
+                ready.put(0)
+            print(f"[ProgressLoad] Client failed: {e}")
+
+    await asyncio.gather(*(client() for _ in range(count)))
+    results.put((received[0], done_at))
+
+
+def client_process(url, count, ready, results):
+    asyncio.run(run_clients(url, count, ready, results))
+
+
+async def watch_loop_lag(interval, lags):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def simulate_analysis(upload_id, events, step_seconds, bugs_every):
+    """Stand-in for run_analysis_task: awaits 'LLM calls' and publishes progress."""
+    lags = []
+    watcher = asyncio.create_task(watch_loop_lag(0.01, lags))
+    start = time.perf_counter()
+    for i in range(events):
+        await asyncio.sleep(step_seconds)
+        payload = {"status": f"Analysed group {i + 1}/{events}", "progress": int(100 * (i + 1) / events)}
+        if bugs_every and i % bugs_every == 0:
+            payload["bug"] = {"file": f"src/f{i}.py", "line": i, "description": "benchmark bug"}
+        await publish_progress(upload_id, payload)
+    elapsed = time.perf_counter() - start
+    done_sent_at = time.time()
+    await publish_progress(upload_id, {"status": "DONE 🚀", "progress": 100})
+    watcher.cancel()
+    return elapsed, max(lags, default=0.0), done_sent_at
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--client-procs", type=int, default=8)
+    parser.add_argument("--events", type=int, default=500, help="progress events published by the simulated analysis")
+    parser.add_argument("--step-ms", type=float, default=10, help="simulated work between events")
+    parser.add_argument("--bugs-every", type=int, default=5, help="attach a bug to every Nth event (0 = never)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    app = FastAPI()
+    app.include_router(progress_ws_router)
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning", backlog=4096, ws_ping_interval=None))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    step_seconds = args.step_ms / 1000
+    baseline, baseline_lag, _ = await simulate_analysis(f"{UPLOAD_ID}-baseline", args.events, step_seconds, args.bugs_every)
+    print(f"[ProgressLoad] Baseline (0 sockets): {baseline:.2f}s, max loop lag {baseline_lag * 1000:.1f}ms")
+
+    url = f"ws://127.0.0.1:{args.port}/ws/progress/{UPLOAD_ID}"
+    ready = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    per_proc = [args.clients // args.client_procs + (1 if i < args.clients % args.client_procs else 0) for i in range(args.client_procs)]
+    procs = [multiprocessing.Process(target=client_process, args=(url, count, ready, results)) for count in per_proc if count]
+    for proc in procs:
+        proc.start()
+
+    connect_start = time.perf_counter()
+    connected = 0
+    for _ in range(args.clients):
+        connected += await asyncio.to_thread(ready.get)
+    print(f"[ProgressLoad] {connected}/{args.clients} sockets connected in {time.perf_counter() - connect_start:.2f}s")
+
+    loaded, loaded_lag, done_sent_at = await simulate_analysis(UPLOAD_ID, args.events, step_seconds, args.bugs_every)
+
+    received = 0
+    done_at = []
+    for _ in procs:
+        proc_received, proc_done_at = await asyncio.to_thread(results.get)
+        received += proc_received
+        done_at.extend(proc_done_at)
+    for proc in procs:
+        proc.join()
+
+    delays = sorted(t - done_sent_at for t in done_at)
+    p99 = delays[max(0, int(len(delays) * 0.99) - 1)] if delays else 0
+    print(f"[ProgressLoad] With {connected} sockets: {loaded:.2f}s ({(loaded / baseline - 1) * 100:+.1f}% vs baseline), "
+          f"max loop lag {loaded_lag * 1000:.1f}ms")
+    print(f"[ProgressLoad] {received} messages delivered; {len(done_at)} clients saw DONE")
+    if delays:
+        print(f"[ProgressLoad] DONE delivery: median {statistics.median(delays) * 1000:.0f}ms, "
+              f"p99 {p99 * 1000:.0f}ms, max {delays[-1] * 1000:.0f}ms")
+    print(snapshot())
+
+    server.should_exit = True
+    await serve
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
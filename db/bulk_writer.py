@@ -0,0 +1,143 @@
+# db/bulk_writer.py
+
+import asyncio
+import os
+import time
+from pymongo import UpdateOne
+from utils.metrics import increment, observe
+
+# Upserts are collected and written as unordered bulk_write batches, either
+# when BULK_WRITE_MAX_OPS documents are pending or BULK_WRITE_FLUSH_SECONDS
+# after the first one arrived. The blocking driver call runs in a thread so
+# the event loop (WebSocket progress, other uploads) never waits on Mongo.
+BULK_WRITE_MAX_OPS = int(os.getenv("BULK_WRITE_MAX_OPS", 500))
+BULK_WRITE_FLUSH_SECONDS = float(os.getenv("BULK_WRITE_FLUSH_SECONDS", 0.25))
+
+
+def _merge_updates(old, new):
+    """Combine two updates to the same document, or return None if they must stay ordered."""
+    if "$push" not in old and set(new) <= {"$set", "$setOnInsert"}:
+        merged_set = {**old.get("$set", {}), **new.get("$set", {})}
+        merged_on_insert = {
+            k: v for k, v in {**new.get("$setOnInsert", {}), **old.get("$setOnInsert", {})}.items()
+            if k not in merged_set
+        }
+        merged = {"$set": merged_set}
+        if merged_on_insert:
+            merged["$setOnInsert"] = merged_on_insert
+        return merged
+
+    if "$push" in old and "$push" in new and set(new) <= {"$push", "$set", "$setOnInsert"}:
+        merged_push = {}
+        for field in set(old["$push"]) | set(new["$push"]):
+            values = []
+            for update in (old, new):
+                value = update["$push"].get(field)
+                if isinstance(value, dict) and "$each" in value:
+                    values.extend(value["$each"])
+                elif field in update["$push"]:
+                    values.append(value)
+            merged_push[field] = {"$each": values}
+        merged = {"$push": merged_push, "$set": {**old.get("$set", {}), **new.get("$set", {})}}
+        if "$setOnInsert" in old or "$setOnInsert" in new:
+            merged["$setOnInsert"] = {**new.get("$setOnInsert", {}), **old.get("$setOnInsert", {})}
+        return merged
+
+    return None
+
+
+class BulkWriter:
+    def __init__(self, collection, max_ops=BULK_WRITE_MAX_OPS, flush_seconds=BULK_WRITE_FLUSH_SECONDS):
+        self.collection = collection
+        self.max_ops = max_ops
+        self.flush_seconds = flush_seconds
+        self.pending = {}
+        self.timer = None
+        self.lock = None
+        self.in_flight = set()
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(filter_docs) on the event loop after every batch is written."""
+        self.listeners.append(callback)
+
+    def upsert(self, filter_doc, update):
+        """Queue an upsert. Returns a future that resolves once it is written."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = tuple(sorted(filter_doc.items()))
+
+        entry = self.pending.get(key)
+        if entry is not None:
+            merged = _merge_updates(entry[1], update)
+            if merged is None:
+                # Conflicting updates to one document must land in order.
+                self._start_flush()
+                entry = None
+            else:
+                entry[1] = merged
+                entry[2].append(future)
+
+        if entry is None:
+            self.pending[key] = [filter_doc, update, [future]]
+
+        if len(self.pending) >= self.max_ops:
+            self._start_flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.flush_seconds, self._start_flush)
+
+        return future
+
+    async def flush(self):
+        self._start_flush()
+        if self.in_flight:
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+
+    def _start_flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, {}
+        task = asyncio.get_running_loop().create_task(self._write(batch))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def _write(self, batch):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+
+        # Batches are written one at a time, in the order they were cut.
+        async with self.lock:
+            ops = [UpdateOne(filter_doc, update, upsert=True) for filter_doc, update, _ in batch.values()]
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.collection.bulk_write, ops, ordered=False)
+                error = None
+            except Exception as e:
+                print(f"[MongoDB] Bulk write of {len(ops)} op(s) to {self.collection.name} failed: {e}")
+                increment(f"mongo.{self.collection.name}.bulk_write_errors")
+                error = e
+
+            observe(f"mongo.{self.collection.name}.bulk_write", time.perf_counter() - start)
+            increment(f"mongo.{self.collection.name}.bulk_write_batches")
+            increment(f"mongo.{self.collection.name}.bulk_write_ops", len(ops))
+
+            # Unordered batches can partially succeed, so listeners run either way.
+            filter_docs = [filter_doc for filter_doc, _, _ in batch.values()]
+            for callback in self.listeners:
+                try:
+                    callback(filter_docs)
+                except Exception as e:
+                    print(f"[MongoDB] Bulk write listener failed: {e}")
+
+            for _, _, futures in batch.values():
+                for future in futures:
+                    if future.done():
+                        continue
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
@@ -0,0 +1,217 @@
+# db/indexes.py
+#
+# Every index the app relies on, in one place. apply_indexes() runs at API and
+# worker startup and is idempotent: existing indexes are left alone.
+#
+# QUERY_SHAPES lists the hot queries issued by the routes and the analysis
+# pipeline. Check that each one is served by an index with:
+#
+#   python -m db.indexes --check
+#
+# which seeds a scratch database on MONGO_URI, applies the registry, runs
+# explain() on every shape and exits non-zero if any plan uses a COLLSCAN.
+# tests/test_query_plans.py does the same for the queries the repository,
+# routes and job queue actually send, so keep both in step with new queries.
+
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+PROGRESS_EVENTS_CAPPED_BYTES = int(os.getenv("PROGRESS_EVENTS_CAPPED_BYTES", 64 * 1024 * 1024))
+PROGRESS_HISTORY_TTL_SECONDS = int(float(os.getenv("PROGRESS_HISTORY_TTL_SECONDS", 3600)))
+
+# Collections that must exist as capped collections before any index (or
+# insert) would create them as regular ones.
+CAPPED_COLLECTIONS = {
+    "progress_events": PROGRESS_EVENTS_CAPPED_BYTES,
+}
+
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING), ("project_id", ASCENDING), ("role", ASCENDING)], unique=True),
+        IndexModel([("project_id", ASCENDING), ("role", ASCENDING)]),
+    ],
+    "projects": [
+        IndexModel([("project_name", ASCENDING)], unique=True),
+    ],
+    "file_analysis": [
+        # /file-bugs, /file_bugs/{upload_id}, per-file upserts, delta base lookups
+        IndexModel([("upload_id", ASCENDING), ("file", ASCENDING)], unique=True),
+        # /upload/{upload_id} (pages ordered by file)
+        IndexModel([("project_id", ASCENDING), ("upload_id", ASCENDING), ("file", ASCENDING)]),
+    ],
+    "uploads": [
+        IndexModel([("upload_id", ASCENDING)], unique=True),
+        # /project/dashboard, /project/my-uploads (keyset pages, newest first)
+        IndexModel([("project_id", ASCENDING), ("timestamp", DESCENDING), ("upload_id", DESCENDING)]),
+        IndexModel([("project_id", ASCENDING), ("user_id", ASCENDING), ("timestamp", DESCENDING), ("upload_id", DESCENDING)]),
+    ],
+    # progress_events is only tailed in insertion order; replay history is
+    # read from progress_history.
+    "progress_history": [
+        IndexModel([("upload_id", ASCENDING)], unique=True),
+        IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=PROGRESS_HISTORY_TTL_SECONDS),
+    ],
+    "response_cache": [
+        IndexModel([("upload_id", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "jobs": [
+        IndexModel([("upload_id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+    ],
+    "analysis_cache": [
+        IndexModel([("project_id", ASCENDING), ("content_hash", ASCENDING), ("version", ASCENDING)], unique=True),
+        IndexModel([("project_id", ASCENDING), ("last_used_at", ASCENDING)]),
+        IndexModel([("last_used_at", ASCENDING)], expireAfterSeconds=ANALYSIS_CACHE_TTL_SECONDS),
+    ],
+}
+
+
+def apply_indexes(database):
+    existing = set(database.list_collection_names())
+    for collection_name, size in CAPPED_COLLECTIONS.items():
+        if collection_name not in existing:
+            try:
+                database.create_collection(collection_name, capped=True, size=size)
+            except OperationFailure as e:
+                # Another process created it first.
+                print(f"[Indexes] Could not create capped collection {collection_name}: {e}")
+
+    for collection_name, indexes in INDEXES.items():
+        try:
+            database[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # An index with the same keys but different options (e.g. a changed
+            # TTL) already exists; it has to be migrated by hand.
+            print(f"[Indexes] Could not apply indexes on {collection_name}: {e}")
+
+
+_SAMPLE_PROJECT = ObjectId()
+_SAMPLE_USER = ObjectId()
+
+# (name, explain command) for every hot query shape.
+QUERY_SHAPES = [
+    ("file-bugs", {"find": "file_analysis", "filter": {"upload_id": "u-1", "file": "u-1/a.py"}, "limit": 1}),
+    ("file_bugs by upload", {"find": "file_analysis", "filter": {"upload_id": "u-1", "file": {"$gt": "u-1/f1.py"}}, "sort": {"file": 1}, "limit": 100}),
+    ("dashboard page", {"find": "uploads", "filter": {"project_id": _SAMPLE_PROJECT}, "sort": {"timestamp": -1, "upload_id": -1}, "limit": 50}),
+    ("dashboard total", {"count": "uploads", "query": {"project_id": _SAMPLE_PROJECT}}),
+    ("my-uploads page", {"find": "uploads", "filter": {"project_id": _SAMPLE_PROJECT, "user_id": _SAMPLE_USER}, "sort": {"timestamp": -1, "upload_id": -1}, "limit": 50}),
+    ("page bug lists", {"aggregate": "file_analysis", "pipeline": [{"$match": {"upload_id": {"$in": ["u-1", "u-2"]}}}, {"$group": {"_id": "$upload_id", "n": {"$sum": 1}}}], "cursor": {}}),
+    ("upload summary", {"find": "uploads", "filter": {"upload_id": "u-1", "project_id": _SAMPLE_PROJECT}, "limit": 1}),
+    ("upload details", {"find": "file_analysis", "filter": {"project_id": _SAMPLE_PROJECT, "upload_id": "u-1"}, "sort": {"file": 1}, "limit": 100}),
+    ("upload file count", {"count": "file_analysis", "query": {"project_id": _SAMPLE_PROJECT, "upload_id": "u-1"}}),
+    ("delta base files", {"find": "file_analysis", "filter": {"upload_id": "u-1", "project_id": _SAMPLE_PROJECT}, "projection": {"file": 1, "source_path": 1}}),
+    ("login", {"find": "users", "filter": {"username": "alice", "project_id": _SAMPLE_PROJECT, "role": "developer"}, "limit": 1}),
+    ("user-stats", {"aggregate": "users", "pipeline": [{"$match": {"project_id": _SAMPLE_PROJECT}}, {"$group": {"_id": "$role", "count": {"$sum": 1}}}], "cursor": {}}),
+    ("project by name", {"find": "projects", "filter": {"project_name": "demo"}, "limit": 1}),
+    ("job status", {"find": "jobs", "filter": {"upload_id": "u-1"}, "limit": 1}),
+    ("claim job", {"find": "jobs", "filter": {"$or": [{"status": "queued"}, {"status": "running", "lease_expires_at": {"$lt": datetime.now(timezone.utc)}}], "attempts": {"$lt": 3}}, "sort": {"created_at": 1}, "limit": 1}),
+    ("fail exhausted jobs", {"find": "jobs", "filter": {"status": "running", "lease_expires_at": {"$lt": datetime.now(timezone.utc)}, "attempts": {"$gte": 3}}, "limit": 1}),
+    ("progress history", {"find": "progress_history", "filter": {"upload_id": "u-1"}, "projection": {"events": 1}, "limit": 1}),
+    ("cache lookup", {"find": "analysis_cache", "filter": {"project_id": _SAMPLE_PROJECT, "content_hash": "h-1", "version": "v"}, "limit": 1}),
+    ("cache eviction", {"find": "analysis_cache", "filter": {"project_id": _SAMPLE_PROJECT}, "sort": {"last_used_at": 1}, "projection": {"_id": 1}}),
+]
+
+
+def collection_scans(plan):
+    """Return every COLLSCAN stage in an explain() plan, ignoring rejected plans."""
+    found = []
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            found.append(plan)
+        for key, value in plan.items():
+            if key != "rejectedPlans":
+                found.extend(collection_scans(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            found.extend(collection_scans(value))
+    return found
+
+
+def seed_sample_data(database, count=500):
+    now = datetime.now(timezone.utc)
+    database["users"].insert_many([
+        {"username": f"user{i}", "project_id": _SAMPLE_PROJECT if i % 10 == 0 else ObjectId(), "role": "developer"}
+        for i in range(count)
+    ])
+    database["projects"].insert_many([{"project_name": f"project{i}"} for i in range(count)])
+    database["file_analysis"].insert_many([
+        {
+            "upload_id": f"u-{i // 5}",
+            "file": f"u-{i // 5}/f{i}.py",
+            "project_id": _SAMPLE_PROJECT if i % 7 == 0 else ObjectId(),
+            "user_id": _SAMPLE_USER if i % 3 == 0 else ObjectId(),
+            "timestamp": now
+        }
+        for i in range(count)
+    ])
+    database["uploads"].insert_many([
+        {
+            "upload_id": f"u-{i}",
+            "project_id": _SAMPLE_PROJECT if i % 7 == 0 else ObjectId(),
+            "user_id": _SAMPLE_USER if i % 3 == 0 else ObjectId(),
+            "timestamp": now
+        }
+        for i in range(count)
+    ])
+    database["jobs"].insert_many([
+        {"upload_id": f"u-{i}", "status": "done", "attempts": 1, "created_at": now}
+        for i in range(count)
+    ])
+    database["analysis_cache"].insert_many([
+        {"project_id": _SAMPLE_PROJECT if i % 5 == 0 else ObjectId(), "content_hash": f"h-{i}", "version": "v", "last_used_at": now}
+        for i in range(count)
+    ])
+
+
+def check_query_plans(database):
+    """Explain every QUERY_SHAPES entry; returns the names of shapes that scan a collection."""
+    failures = []
+    for name, command in QUERY_SHAPES:
+        explain = database.command("explain", command, verbosity="queryPlanner")
+        scans = collection_scans(explain)
+        status = "COLLSCAN" if scans else "ok"
+        print(f"[Indexes] {name:<22} {status}")
+        if scans:
+            failures.append(name)
+    return failures
+
+
+def main():
+    from db.mongo_client import client, MONGO_DB_NAME
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true", help="explain every query shape against a seeded scratch database")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database after --check")
+    args = parser.parse_args()
+
+    if not args.check:
+        apply_indexes(client[MONGO_DB_NAME])
+        print(f"[Indexes] Applied to {MONGO_DB_NAME}")
+        return
+
+    scratch_name = f"{MONGO_DB_NAME}_index_check"
+    client.drop_database(scratch_name)
+    scratch = client[scratch_name]
+    try:
+        seed_sample_data(scratch)
+        apply_indexes(scratch)
+        failures = check_query_plans(scratch)
+    finally:
+        if not args.keep:
+            client.drop_database(scratch_name)
+
+    if failures:
+        print(f"[Indexes] {len(failures)} query shape(s) not covered by an index: {', '.join(failures)}")
+        sys.exit(1)
+    print("[Indexes] All query shapes use an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,31 @@
 
 
 from bson import ObjectId
-from .mongo_client import client
-from pymongo import ASCENDING
+from .mongo_client import client, MONGO_DB_NAME
+from .bulk_writer import BulkWriter
 from datetime import datetime, timezone
 
-db = client["bug_triage_db"]
+db = client[MONGO_DB_NAME]
 
 
 users_collection = db["users"]
 projects_collection = db["projects"]
 file_analysis_collection = db["file_analysis"]
+jobs_collection = db["jobs"]
+analysis_cache_collection = db["analysis_cache"]
 
+file_analysis_writer = BulkWriter(file_analysis_collection)
+analysis_cache_writer = BulkWriter(analysis_cache_collection)
 
 
-users_collection.create_index(
-    [("username", ASCENDING), ("project_id", ASCENDING), ("role", ASCENDING)],
-    unique=True
-)
 
-projects_collection.create_index(
-    [("project_name", ASCENDING)],
-    unique=True
-)
-
-
-def save_to_mongo(upload_id, file_name, parsed_data, user_id, username, project_id, original_name=None, upload_description=""):
+def save_to_mongo(upload_id, file_name, parsed_data, user_id, username, project_id, original_name=None, upload_description="", source_path=None):
+    """Queue the file's upsert on the bulk writer; await the returned future to know it is stored."""
 
     doc = {
         "upload_id": upload_id,
         "file": file_name,
+        "source_path": source_path,
         "original_filename": original_name,
         "bugs_original": parsed_data["bugs_original"],
         "bugs_sanity_checked": parsed_data["bugs_sanity_checked"],
@@ -39,14 +35,45 @@ def save_to_mongo(upload_id, file_name, parsed_data, user_id, username, project_
         "username": username,  
         "project_id": ObjectId(project_id),
         "upload_description": upload_description,  
+        "partial": False,
+        "sanity_pending": parsed_data.get("sanity_pending", False),
+        "static_analysis": parsed_data.get("static_analysis"),
+        "analysis_error": parsed_data.get("analysis_error"),
         "timestamp": datetime.now(timezone.utc)
     }
 
 
-    file_analysis_collection.update_one(
+    print(f"[MongoDB] Queued analysis for file: {file_name} (upload_id={upload_id}) original={original_name} user_id={user_id} project_id={project_id}")
+
+    return file_analysis_writer.upsert(
+        {"upload_id": upload_id, "file": file_name},
+        {"$set": doc}
+    )
+
+
+def save_partial_bug(upload_id, file_name, bug, user_id, username, project_id, original_name=None, upload_description="", source_path=None):
+    """Append one streamed bug to a file's document before its group finishes.
+
+    The final save_to_mongo for the file overwrites bugs_original and clears
+    the partial flag. Returns the bulk writer's future.
+    """
+    return file_analysis_writer.upsert(
         {"upload_id": upload_id, "file": file_name},
-        {"$set": doc},
-        upsert=True
+        {
+            "$push": {"bugs_original": bug},
+            "$set": {"partial": True},
+            "$setOnInsert": {
+                "source_path": source_path,
+                "original_filename": original_name,
+                "bugs_sanity_checked": [],
+                "optimizations_original": [],
+                "optimizations_sanity_checked": [],
+                "user_id": ObjectId(user_id),
+                "username": username,
+                "project_id": ObjectId(project_id),
+                "upload_description": upload_description,
+                "timestamp": datetime.now(timezone.utc)
+            }
+        }
     )
 
-    print(f"[MongoDB] Saved analysis for file: {file_name} (upload_id={upload_id}) original={original_name} user_id={user_id} project_id={project_id}")
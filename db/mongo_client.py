@@ -1,7 +1,21 @@
 from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 import os
 
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB_NAME = "bug_triage_db"
 
-client = MongoClient(MONGO_URI)
+# Shared by the sync client (analysis writes, job queue, worker) and the
+# async client the routes use through db/repository.py.
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 100)),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000)),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000)),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000)),
+}
+
+client = MongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
+async_client = AsyncIOMotorClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
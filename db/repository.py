@@ -0,0 +1,226 @@
+# db/repository.py
+#
+# Async data access for the HTTP routes. Everything here runs on the Motor
+# client, so a slow query only suspends its own request instead of blocking
+# the event loop (and with it WebSocket progress for running analyses).
+
+import asyncio
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from .mongo_client import async_client, MONGO_DB_NAME
+from .upload_summaries import summary_update
+
+async_db = async_client[MONGO_DB_NAME]
+
+users = async_db["users"]
+projects = async_db["projects"]
+file_analysis = async_db["file_analysis"]
+jobs = async_db["jobs"]
+uploads = async_db["uploads"]
+
+JOB_STATUS_PROJECTION = {"payload.connected_groups": 0, "payload.file_previews": 0, "payload.extract_paths": 0}
+
+
+# --- users ---
+
+async def find_user(user_id):
+    return await users.find_one({"_id": ObjectId(user_id)})
+
+
+async def find_user_for_login(username, project_id, role):
+    return await users.find_one({
+        "username": username,
+        "project_id": ObjectId(project_id),
+        "role": role
+    })
+
+
+async def username_taken(username, project_id, exclude_user_id=None):
+    query = {"username": username, "project_id": ObjectId(project_id)}
+    if exclude_user_id is not None:
+        query["_id"] = {"$ne": ObjectId(exclude_user_id)}
+    return await users.find_one(query, {"_id": 1}) is not None
+
+
+async def insert_user(user_doc):
+    result = await users.insert_one(user_doc)
+    return result.inserted_id
+
+
+async def update_user(user_id, updates):
+    await users.update_one({"_id": ObjectId(user_id)}, {"$set": updates})
+
+
+async def count_users_by_role(project_id):
+    counts = {}
+    async for row in users.aggregate([
+        {"$match": {"project_id": ObjectId(project_id)}},
+        {"$group": {"_id": "$role", "count": {"$sum": 1}}}
+    ]):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+# --- projects ---
+
+async def find_project(project_id):
+    return await projects.find_one({"_id": ObjectId(project_id)})
+
+
+async def find_project_by_name(project_name):
+    return await projects.find_one({"project_name": project_name}, {"_id": 1})
+
+
+async def list_projects():
+    return await projects.find({}, {"project_name": 1}).to_list(length=None)
+
+
+async def insert_project(project_doc):
+    result = await projects.insert_one(project_doc)
+    return result.inserted_id
+
+
+async def set_project_creator_if_missing(project_id, user_id):
+    await projects.update_one(
+        {"_id": ObjectId(project_id), "creator_user_id": None},
+        {"$set": {"creator_user_id": user_id}}
+    )
+
+
+# --- file analysis ---
+
+async def find_file_analysis(upload_id, file_name):
+    return await file_analysis.find_one({"upload_id": upload_id, "file": file_name})
+
+
+async def list_file_analysis(query, projection=None):
+    return await file_analysis.find(query, projection).to_list(length=None)
+
+
+def file_analysis_query(query, after_file=None):
+    if after_file is None:
+        return query
+    return {**query, "file": {"$gt": after_file}}
+
+
+async def list_file_analysis_page(query, projection=None, limit=None, after_file=None):
+    """Documents ordered by file, resuming after after_file (keyset on file)."""
+    cursor = file_analysis.find(file_analysis_query(query, after_file), projection).sort("file", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return await cursor.to_list(length=None)
+
+
+async def iter_file_analysis(query, projection=None, limit=None, after_file=None, batch_size=100):
+    """Yield documents ordered by file as the cursor produces them."""
+    cursor = file_analysis.find(file_analysis_query(query, after_file), projection).sort("file", 1).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    async for doc in cursor:
+        yield doc
+
+
+async def count_file_analysis(query):
+    return await file_analysis.count_documents(query)
+
+
+async def find_first_file_analysis(query, projection=None):
+    return await file_analysis.find_one(query, projection)
+
+
+async def merge_bug_lists(upload_ids):
+    """{upload_id: [every sanity-checked bug of the upload]} in one aggregation."""
+    rows = await file_analysis.aggregate([
+        {"$match": {"upload_id": {"$in": upload_ids}}},
+        {"$group": {"_id": "$upload_id", "bug_lists": {"$push": {"$ifNull": ["$bugs_sanity_checked", []]}}}},
+        {"$project": {"bugs": {"$reduce": {
+            "input": "$bug_lists",
+            "initialValue": [],
+            "in": {"$concatArrays": ["$$value", "$$this"]}
+        }}}}
+    ]).to_list(length=None)
+    return {row["_id"]: row["bugs"] for row in rows}
+
+
+# --- upload summaries ---
+
+async def create_upload_summary(upload_id, header):
+    await uploads.update_one(
+        {"upload_id": upload_id},
+        {"$setOnInsert": {**header, "num_files": 0, "file_names": [], "bug_count": 0, "bugs_by_priority": {}}},
+        upsert=True
+    )
+
+
+async def add_to_upload_summary(upload_id, part_key, files, header):
+    filter_doc, update = summary_update(upload_id, part_key, files, header)
+    try:
+        await uploads.update_one(filter_doc, update, upsert=True)
+    except DuplicateKeyError:
+        pass
+
+
+async def find_upload_summary(upload_id, project_id):
+    return await uploads.find_one({"upload_id": upload_id, "project_id": ObjectId(project_id)})
+
+
+async def list_upload_summaries(query, limit, after=None):
+    """One page of upload summaries, newest first, plus the total matching query.
+
+    after is the (timestamp, upload_id) of the last upload on the previous page.
+    """
+    page_query = dict(query)
+    if after is not None:
+        after_timestamp, after_upload_id = after
+        page_query["$or"] = [
+            {"timestamp": {"$lt": after_timestamp}},
+            {"timestamp": after_timestamp, "upload_id": {"$lt": after_upload_id}}
+        ]
+
+    page, total = await asyncio.gather(
+        uploads.find(page_query, {"summarized_groups": 0})
+        .sort([("timestamp", -1), ("upload_id", -1)])
+        .limit(limit)
+        .to_list(length=None),
+        uploads.count_documents(query)
+    )
+    return page, total
+
+
+async def carry_over_file_analysis(base_upload_id, upload_id, doc_ids, user_id, username, upload_description=""):
+    """Copy unchanged file results from a base upload into a new upload, server-side."""
+    if not doc_ids:
+        return 0
+
+    await file_analysis.aggregate([
+        {"$match": {"upload_id": base_upload_id, "_id": {"$in": doc_ids}, "partial": {"$ne": True}, "sanity_pending": {"$ne": True}}},
+        {"$set": {
+            "upload_id": upload_id,
+            "carried_from": base_upload_id,
+            "user_id": ObjectId(user_id),
+            "username": username,
+            "upload_description": upload_description,
+            "timestamp": datetime.now(timezone.utc)
+        }},
+        {"$unset": "_id"},
+        {"$merge": {
+            "into": file_analysis.name,
+            "on": ["upload_id", "file"],
+            "whenMatched": "keepExisting",
+            "whenNotMatched": "insert"
+        }}
+    ]).to_list(length=None)
+
+    print(f"[MongoDB] Carried over {len(doc_ids)} file(s) from upload_id={base_upload_id} to upload_id={upload_id}")
+    return len(doc_ids)
+
+
+# --- jobs ---
+
+async def get_job_status(upload_id):
+    return await jobs.find_one({"upload_id": upload_id}, JOB_STATUS_PROJECTION)
+
+
+def close():
+    async_client.close()
@@ -0,0 +1,159 @@
+# db/upload_summaries.py
+#
+# One small document per upload in the `uploads` collection, kept up to date
+# while the analysis runs so dashboards never re-aggregate file_analysis:
+#
+#   {upload_id, project_id, user_id, username, upload_description,
+#    original_filename, timestamp, num_files, file_names, bug_count,
+#    bugs_by_priority: {"High": n, ...}, summarized_groups: [...]}
+#
+# Each analysed group (and a delta upload's carried-over files) is added
+# exactly once: summarized_groups records which parts are already counted,
+# so a group that is re-run after a worker crash does not double the $inc.
+#
+# Backfill or repair existing data with:
+#
+#   python -m db.upload_summaries --rebuild [--project PROJECT_ID]
+
+import argparse
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from .models import db, file_analysis_collection, jobs_collection
+
+uploads_collection = db["uploads"]
+
+REBUILD_BATCH_SIZE = 500
+
+
+def priority_key(bug):
+    priority = str(bug.get("priority") or "Unknown").strip().capitalize() or "Unknown"
+    return priority.replace(".", "_").replace("$", "_")
+
+
+def summary_header(user_id, username, project_id, upload_description="", original_filename=None, timestamp=None):
+    return {
+        "project_id": ObjectId(project_id),
+        "user_id": ObjectId(user_id),
+        "username": username,
+        "upload_description": upload_description,
+        "original_filename": original_filename,
+        "timestamp": timestamp or datetime.now(timezone.utc)
+    }
+
+
+def summary_update(upload_id, part_key, files, header):
+    """(filter, update) that adds files [(file_name, sanity_checked_bugs)] to an upload once."""
+    increments = {"num_files": len(files), "bug_count": 0}
+    for _, bugs in files:
+        increments["bug_count"] += len(bugs)
+        for bug in bugs:
+            key = f"bugs_by_priority.{priority_key(bug)}"
+            increments[key] = increments.get(key, 0) + 1
+
+    filter_doc = {"upload_id": upload_id, "summarized_groups": {"$ne": part_key}}
+    update = {
+        "$inc": increments,
+        "$addToSet": {
+            "file_names": {"$each": [file_name for file_name, _ in files]},
+            "summarized_groups": part_key
+        },
+        "$set": {"updated_at": datetime.now(timezone.utc)},
+        "$setOnInsert": header
+    }
+    return filter_doc, update
+
+
+def add_to_upload_summary(upload_id, part_key, files, header):
+    filter_doc, update = summary_update(upload_id, part_key, files, header)
+    try:
+        uploads_collection.update_one(filter_doc, update, upsert=True)
+    except DuplicateKeyError:
+        # The upload exists and part_key is already counted.
+        pass
+
+
+def rebuild_upload_summaries(project_id=None):
+    """Recompute summaries from file_analysis; returns the number of uploads written."""
+    query = {"project_id": ObjectId(project_id)} if project_id else {}
+    docs = file_analysis_collection.find(
+        query,
+        {
+            "upload_id": 1, "file": 1, "project_id": 1, "user_id": 1, "username": 1,
+            "upload_description": 1, "original_filename": 1, "timestamp": 1,
+            "carried_from": 1, "bugs_sanity_checked.priority": 1
+        }
+    ).sort([("upload_id", 1), ("file", 1)])
+
+    written = 0
+    batch = []
+    current = None
+
+    def finish(summary):
+        job = jobs_collection.find_one({"upload_id": summary["upload_id"]}, {"completed_groups": 1})
+        parts = [f"group:{i}" for i in (job or {}).get("completed_groups", [])]
+        if summary.pop("has_carried"):
+            parts.append("carry_over")
+        summary["summarized_groups"] = parts
+        summary["updated_at"] = datetime.now(timezone.utc)
+        batch.append(ReplaceOne({"upload_id": summary["upload_id"]}, summary, upsert=True))
+
+    for doc in docs:
+        if current is None or current["upload_id"] != doc["upload_id"]:
+            if current is not None:
+                finish(current)
+                written += 1
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    uploads_collection.bulk_write(batch, ordered=False)
+                    batch = []
+            current = {
+                "upload_id": doc["upload_id"],
+                "project_id": doc.get("project_id"),
+                "user_id": doc.get("user_id"),
+                "username": doc.get("username"),
+                "upload_description": doc.get("upload_description"),
+                "original_filename": doc.get("original_filename"),
+                "timestamp": doc.get("timestamp"),
+                "num_files": 0,
+                "file_names": [],
+                "bug_count": 0,
+                "bugs_by_priority": {},
+                "has_carried": False
+            }
+
+        current["num_files"] += 1
+        current["file_names"].append(doc.get("file"))
+        if doc.get("timestamp") and (current["timestamp"] is None or doc["timestamp"] < current["timestamp"]):
+            current["timestamp"] = doc["timestamp"]
+        if doc.get("carried_from"):
+            current["has_carried"] = True
+        for bug in doc.get("bugs_sanity_checked", []):
+            current["bug_count"] += 1
+            key = priority_key(bug)
+            current["bugs_by_priority"][key] = current["bugs_by_priority"].get(key, 0) + 1
+
+    if current is not None:
+        finish(current)
+        written += 1
+    if batch:
+        uploads_collection.bulk_write(batch, ordered=False)
+
+    print(f"[UploadSummaries] Rebuilt {written} upload summaries")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true", help="recompute summaries from file_analysis")
+    parser.add_argument("--project", help="only rebuild uploads of this project id")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild_upload_summaries(args.project)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,14 @@ import os
 from routes import auth
 from routes import project
 from routes import me
+from routes import metrics
+from services.llm_client import close_llm_client
+from db.models import db, file_analysis_writer, analysis_cache_writer
+from db.indexes import apply_indexes
+import asyncio
+from db import repository
+from utils.auth_utils import shutdown_password_pool
+from services.static_checks import shutdown_static_pool
 
 load_dotenv()
 
@@ -30,9 +38,30 @@ app.include_router(file_bugs.router, tags=["File Bugs"])
 app.include_router(auth.router, tags=["Auth"])
 app.include_router(project.router, tags=["Project"])
 app.include_router(me.router, tags=["Me"])
+app.include_router(metrics.router, tags=["Metrics"])
 
 
 
+@app.on_event("startup")
+async def startup():
+    await asyncio.to_thread(apply_indexes, db)
+    if upload.ANALYSIS_EXECUTOR == "inline":
+        # Resume jobs left behind by a crashed or restarted API process.
+        app.state.job_sweeper = asyncio.create_task(upload.sweep_jobs())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if getattr(app.state, "job_sweeper", None) is not None:
+        app.state.job_sweeper.cancel()
+    await file_analysis_writer.flush()
+    await analysis_cache_writer.flush()
+    await close_llm_client()
+    shutdown_password_pool()
+    shutdown_static_pool()
+    repository.close()
+
+
 @app.get("/")
 async def root():
     return {"message":"Welcome to Intelligent Bug Triage System API "}
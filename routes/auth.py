@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from db.models import users_collection, projects_collection
-from utils.auth_utils import hash_password, verify_password, create_jwt_token
+from db import repository
+from utils.auth_utils import hash_password_async, verify_password_async, password_needs_rehash, create_jwt_token
 from bson import ObjectId
 from datetime import datetime, timezone
 
@@ -23,25 +23,21 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/register")
-def register_user(data: RegisterRequest):
+async def register_user(data: RegisterRequest):
     username = data.username.strip().lower()
     password = data.password
     project_id = data.project_id
     role = data.role
 
-    project = projects_collection.find_one({"_id": ObjectId(project_id)})
+    project = await repository.find_project(project_id)
     if not project:
         raise HTTPException(status_code=400, detail="Invalid project_id. Project not found.")
 
-    existing_user = users_collection.find_one({
-        "username": username,
-        "project_id": ObjectId(project_id),
-        "role": role
-    })
+    existing_user = await repository.find_user_for_login(username, project_id, role)
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists for this role in this project.")
 
-    password_hash = hash_password(password)
+    password_hash = await hash_password_async(password)
     user_doc = {
         "username": username,
         "password_hash": password_hash,
@@ -50,13 +46,10 @@ def register_user(data: RegisterRequest):
         "created_at": datetime.now(timezone.utc)
     }
 
-    user_id = users_collection.insert_one(user_doc).inserted_id
+    user_id = await repository.insert_user(user_doc)
 
     if project.get("creator_user_id") is None:
-        projects_collection.update_one(
-            {"_id": ObjectId(project_id)},
-            {"$set": {"creator_user_id": user_id}}
-        )
+        await repository.set_project_creator_if_missing(project_id, user_id)
 
     return {
         "message": "User registered successfully.",
@@ -67,24 +60,24 @@ def register_user(data: RegisterRequest):
 
 
 @router.post("/login")
-def login_user(data: LoginRequest):
+async def login_user(data: LoginRequest):
     username = data.username.strip().lower()
     password = data.password
     project_id = data.project_id
     role = data.role
 
-    user = users_collection.find_one({
-        "username": username,
-        "project_id": ObjectId(project_id),
-        "role": role
-    })
+    user = await repository.find_user_for_login(username, project_id, role)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found with this role and project.")
 
-    if not verify_password(password, user["password_hash"]):
+    if not await verify_password_async(password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Incorrect password.")
 
+    if password_needs_rehash(user["password_hash"]):
+        # Hashed under an older BCRYPT_ROUNDS.
+        await repository.update_user(user["_id"], {"password_hash": await hash_password_async(password)})
+
     token = create_jwt_token(
         user_id=str(user["_id"]),
         project_id=str(project_id),
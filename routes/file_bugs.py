@@ -1,57 +1,103 @@
 
-from fastapi import APIRouter, HTTPException, Query
-from db.models import file_analysis_collection
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Optional
+from utils.ndjson import ndjson_response, parse_fields, wants_ndjson
+from utils.pagination import encode_cursor, decode_cursor, MAX_PAGE_SIZE
+from db import repository
+from services.response_cache import response_cache
 
 router = APIRouter()
 
 @router.get("/file-bugs")
-async def get_file_bugs(upload_id: str = Query(...), file: str = Query(...)):
+async def get_file_bugs(request: Request, upload_id: str = Query(...), file: str = Query(...)):
     file = file.strip()  
 
-    doc = file_analysis_collection.find_one({ "upload_id": upload_id, "file": file })
+    async def produce():
+        doc = await repository.find_file_analysis(upload_id, file)
 
-    if not doc:
-        print(f"[GET /file-bugs] upload_id={upload_id} file={file} → NOT FOUND")
-        raise HTTPException(status_code=404, detail="File not found in analysis results.")
+        if not doc:
+            print(f"[GET /file-bugs] upload_id={upload_id} file={file} → NOT FOUND")
+            raise HTTPException(status_code=404, detail="File not found in analysis results.")
 
-    print(f"[GET /file-bugs] upload_id={upload_id} file={file} → FOUND ")
-
-    return {
-        "file": doc["file"],
-        "bugs_original": doc.get("bugs_original", []),
-        "bugs_sanity_checked": doc.get("bugs_sanity_checked", []),
-        "optimizations_original": doc.get("optimizations_original", []),
-        "optimizations_sanity_checked": doc.get("optimizations_sanity_checked", []),
-    }
+        print(f"[GET /file-bugs] upload_id={upload_id} file={file} → FOUND ")
 
+        return {
+            "file": doc["file"],
+            "bugs_original": doc.get("bugs_original", []),
+            "bugs_sanity_checked": doc.get("bugs_sanity_checked", []),
+            "optimizations_original": doc.get("optimizations_original", []),
+            "optimizations_sanity_checked": doc.get("optimizations_sanity_checked", []),
+        }, None
 
+    return await response_cache.respond(request, upload_id, produce)
 
-@router.get("/file_bugs/{upload_id}")
-async def get_all_file_bugs(upload_id: str):
-    docs = file_analysis_collection.find({ "upload_id": upload_id })
-
-    results = []
 
-    for doc in docs:
-        original_name = doc.get("original_filename", "(unknown)")
-        file_path = doc.get("file", "")
-        zip_name = doc.get("zip_name", "")  
-        bugs = doc.get("bugs_sanity_checked", [])
 
-        results.append({
-            "file_path": file_path,
-            "file_name": original_name,
-            "zip_name": zip_name,             
-            "bugs": bugs
-        })  
+# Output key -> file_analysis field, for fields= projection.
+FILE_BUGS_FIELDS = {
+    "file_path": "file",
+    "file_name": "original_filename",
+    "zip_name": "zip_name",
+    "bugs": "bugs_sanity_checked"
+}
 
-        print(f"[DEBUG] {file_path} from {original_name} → {len(bugs)} bug(s)")
 
-    if not results:
-        print(f"[GET /file_bugs/{upload_id}] → No files found ")
-    else:
-        print(f"[GET /file_bugs/{upload_id}] → {len(results)} file(s) ")
-
-    return results
+def file_bugs_entry(doc, fields):
+    entry = {
+        "file_path": doc.get("file", ""),
+        "file_name": doc.get("original_filename", "(unknown)"),
+        "zip_name": doc.get("zip_name", ""),
+        "bugs": doc.get("bugs_sanity_checked", [])
+    }
+    return {key: entry[key] for key in fields}
 
 
+@router.get("/file_bugs/{upload_id}")
+async def get_all_file_bugs(
+    upload_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = None
+):
+    """Results per file, ordered by file path.
+
+    fields=   comma-separated subset of file_path, file_name, zip_name, bugs
+    limit=    page size; the next page's cursor is in the X-Next-Cursor header
+    format=ndjson (or Accept: application/x-ndjson) streams one file per line;
+              with limit=, a final {"next_cursor": ...} line follows a full page
+    """
+    fields = parse_fields(fields, FILE_BUGS_FIELDS)
+    projection = {"_id": 0, "file": 1, **{FILE_BUGS_FIELDS[key]: 1 for key in fields}}
+    after_file = decode_cursor(cursor, 1)[0] if cursor else None
+    query = { "upload_id": upload_id }
+
+    if wants_ndjson(request, format):
+        print(f"[GET /file_bugs/{upload_id}] → streaming")
+
+        async def entries():
+            count, last_file = 0, None
+            async for doc in repository.iter_file_analysis(query, projection, limit, after_file):
+                count, last_file = count + 1, doc["file"]
+                yield file_bugs_entry(doc, fields)
+            if limit and count == limit:
+                yield {"next_cursor": encode_cursor(last_file)}
+
+        return ndjson_response(entries())
+
+    async def produce():
+        docs = await repository.list_file_analysis_page(query, projection, limit, after_file)
+
+        results = [file_bugs_entry(doc, fields) for doc in docs]
+
+        if not results:
+            print(f"[GET /file_bugs/{upload_id}] → No files found ")
+        else:
+            print(f"[GET /file_bugs/{upload_id}] → {len(results)} file(s) ")
+
+        if limit and len(docs) == limit:
+            return results, {"X-Next-Cursor": encode_cursor(docs[-1]["file"])}
+        return results, None
+
+    return await response_cache.respond(request, upload_id, produce)
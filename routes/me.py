@@ -2,9 +2,9 @@
 
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from db.models import users_collection, projects_collection
-from utils.auth_utils import get_current_user_data, hash_password
-from bson import ObjectId
+from db import repository
+from services.principal_cache import resolve_principal, invalidate_principal
+from utils.auth_utils import get_current_user_data, hash_password_async
 from typing import Optional  
 
 router = APIRouter()
@@ -17,31 +17,25 @@ class UpdateMeRequest(BaseModel):
 
 
 @router.get("/me")
-def get_me(user_data: dict = Depends(get_current_user_data)):
-    user_id = ObjectId(user_data["user_id"])
-    project_id = ObjectId(user_data["project_id"])
-
-    user = users_collection.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found.")
-
-    project = projects_collection.find_one({"_id": project_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found.")
+async def get_me(user_data: dict = Depends(get_current_user_data)):
+    try:
+        principal = await resolve_principal(user_data["user_id"], user_data["project_id"])
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=f"{e} not found.")
 
     return {
-        "username": user["username"],
-        "project_name": project["project_name"],
-        "role": user.get("role", "developer")  
+        "username": principal["username"],
+        "project_name": principal["project_name"],
+        "role": principal["role"]
     }
 
 
 @router.put("/me")
-def update_me(data: UpdateMeRequest, user_data: dict = Depends(get_current_user_data)):
-    user_id = ObjectId(user_data["user_id"])
-    project_id = ObjectId(user_data["project_id"])
+async def update_me(data: UpdateMeRequest, user_data: dict = Depends(get_current_user_data)):
+    user_id = user_data["user_id"]
+    project_id = user_data["project_id"]
 
-    user = users_collection.find_one({"_id": user_id})
+    user = await repository.find_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
 
@@ -49,25 +43,18 @@ def update_me(data: UpdateMeRequest, user_data: dict = Depends(get_current_user_
 
     if data.new_username:
         
-        existing_user = users_collection.find_one({
-            "username": data.new_username,
-            "project_id": project_id,
-            "_id": {"$ne": user_id} 
-        })
-        if existing_user:
+        if await repository.username_taken(data.new_username, project_id, exclude_user_id=user_id):
             raise HTTPException(status_code=400, detail="Username already exists in this Project.")
 
         updates["username"] = data.new_username
 
 
     if data.new_password:
-        updates["password_hash"] = hash_password(data.new_password)
+        updates["password_hash"] = await hash_password_async(data.new_password)
 
 
     if updates:
-        users_collection.update_one(
-            {"_id": user_id},
-            {"$set": updates}
-        )
+        await repository.update_user(user_id, updates)
+        invalidate_principal(user_id)
 
     return {"message": "Profile updated successfully."}
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from utils.metrics import snapshot
+from services.llm_scheduler import llm_scheduler
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def get_metrics():
+    return {
+        **snapshot(),
+        "llm_scheduler": llm_scheduler.stats()
+    }
@@ -1,26 +1,81 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 import asyncio
+import os
+import time
+from services.progress_bus import progress_bus
+from utils.metrics import increment, gauges, set_gauge
 
 router = APIRouter()
 
-connected_websockets = {}
+# The server sends {"type": "ping"} after PROGRESS_WS_PING_SECONDS without
+# other traffic. Clients may answer with any message (e.g. "pong"); once a
+# client has answered, it is dropped if it stays silent for
+# PROGRESS_WS_PONG_TIMEOUT_SECONDS. Clients that never answer are only
+# dropped when the socket closes or a send fails.
+PROGRESS_WS_PING_SECONDS = float(os.getenv("PROGRESS_WS_PING_SECONDS", 20))
+PROGRESS_WS_PONG_TIMEOUT_SECONDS = float(os.getenv("PROGRESS_WS_PONG_TIMEOUT_SECONDS", 60))
+
+# Close code telling the client to reconnect later (it then gets the history).
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class ClientState:
+    def __init__(self):
+        self.last_heard = None
+
+
+async def receive_until_disconnect(websocket, state):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        state.last_heard = time.monotonic()
+
+
+async def send_events(websocket, subscription, state):
+    while True:
+        payload = await subscription.get(timeout=PROGRESS_WS_PING_SECONDS)
+
+        if subscription.overflowed:
+            increment("progress_ws.closed_slow")
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+            return
+
+        if payload is None:
+            if state.last_heard is not None and time.monotonic() - state.last_heard > PROGRESS_WS_PONG_TIMEOUT_SECONDS:
+                increment("progress_ws.closed_unresponsive")
+                await websocket.close()
+                return
+            payload = {"type": "ping"}
+
+        await websocket.send_json(payload)
+        increment("progress_ws.sent")
+
 
 @router.websocket("/ws/progress/{upload_id}")
 async def websocket_endpoint(websocket: WebSocket, upload_id: str):
     await websocket.accept()
-    if upload_id not in connected_websockets:
-        connected_websockets[upload_id] = []
-    connected_websockets[upload_id].append(websocket)
-    print(f"[WebSocket] Client connected for upload_id={upload_id} — total: {len(connected_websockets[upload_id])}")
 
+    # Replays the upload's history first, then follows live events. Sending
+    # runs in its own task so a slow client only ever backs up its own queue.
+    state = ClientState()
+    subscription = None
+    tasks = []
+    set_gauge("progress_ws.connections", gauges.get("progress_ws.connections", 0) + 1)
     try:
-        while True:
-          
-            await asyncio.sleep(1)
-    except WebSocketDisconnect: 
-        connected_websockets[upload_id].remove(websocket)
-        print(f"[WebSocket] Client disconnected for upload_id={upload_id} — remaining: {len(connected_websockets[upload_id])}")
-        
-
-        if len(connected_websockets[upload_id]) == 0:
-            del connected_websockets[upload_id]
+        subscription = await progress_bus.subscribe(upload_id)
+        tasks = [
+            asyncio.create_task(receive_until_disconnect(websocket, state)),
+            asyncio.create_task(send_events(websocket, subscription, state))
+        ]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"[WebSocket] Connection for upload_id={upload_id} failed: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        if subscription is not None:
+            await progress_bus.unsubscribe(upload_id, subscription)
+        set_gauge("progress_ws.connections", gauges.get("progress_ws.connections", 1) - 1)
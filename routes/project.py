@@ -1,14 +1,16 @@
 # routes/project.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from db.models import projects_collection
 from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from typing import Optional
 from utils.auth_utils import get_current_user_data
 from bson import ObjectId
-from db.models import file_analysis_collection
 import os
-from db.models import users_collection
+from db import repository
+from services.response_cache import response_cache
+from utils.pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.ndjson import ndjson_response, parse_fields, wants_ndjson
 
 router = APIRouter()
 
@@ -19,8 +21,8 @@ class CreateProjectRequest(BaseModel):
 
 
 @router.get("/projects/list")
-def list_projects():
-    projects = projects_collection.find({}, {"project_name": 1})
+async def list_projects():
+    projects = await repository.list_projects()
     project_list = [
         {"project_id": str(p["_id"]), "project_name": p["project_name"]}
         for p in projects
@@ -29,14 +31,14 @@ def list_projects():
 
 
 @router.post("/projects/create")
-def create_project(data: CreateProjectRequest):
+async def create_project(data: CreateProjectRequest):
     project_name = data.project_name.strip()
 
     if not project_name:
         raise HTTPException(status_code=400, detail="Project name cannot be empty.")
 
 
-    existing = projects_collection.find_one({"project_name": project_name})
+    existing = await repository.find_project_by_name(project_name)
     if existing:
         raise HTTPException(status_code=400, detail="Project name already exists.")
 
@@ -46,7 +48,7 @@ def create_project(data: CreateProjectRequest):
         "creator_user_id": None,  
         "created_at": datetime.now(timezone.utc)
     }
-    project_id = projects_collection.insert_one(project_doc).inserted_id
+    project_id = await repository.insert_project(project_doc)
 
     return {
         "message": "Project created successfully.",
@@ -56,66 +58,63 @@ def create_project(data: CreateProjectRequest):
 
 
 
-@router.get("/project/dashboard")
-def project_dashboard(user_data: dict = Depends(get_current_user_data)):
-    project_id = ObjectId(user_data["project_id"])
+async def upload_summaries(query, project_id, limit, cursor, counts_only):
+    after = decode_cursor(cursor, 2) if cursor else None
+    docs, total = await repository.list_upload_summaries(query, limit, after)
 
-   
-    upload_ids = file_analysis_collection.distinct("upload_id", {"project_id": project_id})
+    bug_lists = {}
+    if not counts_only and docs:
+        bug_lists = await repository.merge_bug_lists([doc["upload_id"] for doc in docs])
 
     uploads = []
-    for upload_id in upload_ids:
-       
-        first_doc = file_analysis_collection.find_one({"upload_id": upload_id})
-
-       
-        num_files = file_analysis_collection.count_documents({"upload_id": upload_id})
-
-        
-        all_docs = file_analysis_collection.find({"upload_id": upload_id})
-
-        bugs_sanity_checked = []
-        for doc in all_docs:
-            bugs_sanity_checked.extend(doc.get("bugs_sanity_checked", []))
+    for doc in docs:
+        upload = {
+            "upload_id": doc["upload_id"],
+            "upload_description": doc.get("upload_description"),
+            "original_filename": doc.get("original_filename"),
+            "user_id": str(doc.get("user_id")),
+            "username": doc.get("username"),
+            "timestamp": doc.get("timestamp"),
+            "num_files": doc.get("num_files", 0),
+            "bug_count": doc.get("bug_count", 0),
+            "bugs_by_priority": doc.get("bugs_by_priority", {})
+        }
+        if not counts_only:
+            upload["file_names"] = [os.path.basename(f or "") for f in doc.get("file_names", [])]
+            upload["bugs_sanity_checked"] = bug_lists.get(doc["upload_id"], [])
+        uploads.append(upload)
 
-       
-        file_names = [os.path.basename(doc.get("file", "")) for doc in file_analysis_collection.find({"upload_id": upload_id})]
-
-        uploads.append({
-            "upload_id": upload_id,
-            "upload_description": first_doc.get("upload_description"),
-            "original_filename": first_doc.get("original_filename"),
-            "user_id": str(first_doc.get("user_id")),
-            "username": first_doc.get("username"),
-            "timestamp": first_doc.get("timestamp"),
-            "num_files": num_files,
-            "file_names": file_names,  
-            "bugs_sanity_checked": bugs_sanity_checked
-        })
+    next_cursor = None
+    if len(docs) == limit:
+        next_cursor = encode_cursor(docs[-1].get("timestamp"), docs[-1]["upload_id"])
 
+    return {
+        "project_id": str(project_id),
+        "uploads": uploads,
+        "total_uploads": total,
+        "next_cursor": next_cursor
+    }
 
-    uploads.sort(key=lambda x: x["timestamp"], reverse=True)
 
-    return {"project_id": str(user_data["project_id"]), "uploads": uploads}
+@router.get("/project/dashboard")
+async def project_dashboard(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    counts_only: bool = False,
+    user_data: dict = Depends(get_current_user_data)
+):
+    project_id = ObjectId(user_data["project_id"])
+    return await upload_summaries({"project_id": project_id}, project_id, limit, cursor, counts_only)
 
 
 
 
 
 @router.get("/project/user-stats")
-def user_stats(user_data: dict = Depends(get_current_user_data)):
-    project_id = ObjectId(user_data["project_id"])
-
-    users = users_collection.find({"project_id": project_id})
-    developers = 0
-    team_leads = 0
-
-    for user in users:
-        role = user.get("role", "developer")
-        if role == "team_lead":
-            team_leads += 1
-        else:
-            developers += 1
+async def user_stats(user_data: dict = Depends(get_current_user_data)):
+    counts = await repository.count_users_by_role(user_data["project_id"])
+    team_leads = counts.get("team_lead", 0)
+    developers = sum(counts.values()) - team_leads
 
     return {
         "developers": developers,
@@ -123,135 +122,121 @@ def user_stats(user_data: dict = Depends(get_current_user_data)):
     }
 
 @router.get("/project/my-uploads")
-def my_uploads(user_data: dict = Depends(get_current_user_data)):
+async def my_uploads(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    counts_only: bool = False,
+    user_data: dict = Depends(get_current_user_data)
+):
     project_id = ObjectId(user_data["project_id"])
     user_id = ObjectId(user_data["user_id"])
+    return await upload_summaries({"project_id": project_id, "user_id": user_id}, project_id, limit, cursor, counts_only)
 
-    
-    upload_ids = file_analysis_collection.distinct(
-        "upload_id", {"project_id": project_id, "user_id": user_id}
-    )
 
-    uploads = []
-    for upload_id in upload_ids:
-        all_docs_cursor = file_analysis_collection.find({
-            "project_id": project_id,
-            "upload_id": upload_id,
-            "user_id": user_id
-        })
-
-        files_data = []
-        first_doc = None
-        for doc in all_docs_cursor:
-            if first_doc is None:
-                first_doc = doc
-
-            files_data.append(doc)
-
-        if first_doc is None:
-            print("[DEBUG] MyUploads fallback → trying without project_id")
-            all_docs_cursor = file_analysis_collection.find({
-                "upload_id": upload_id,
-                "user_id": user_id
-            })
-
-            for doc in all_docs_cursor:
-                if first_doc is None:
-                    first_doc = doc
-                files_data.append(doc)
-
-        if first_doc is None:
-            continue  
-
-        
-        bugs_sanity_checked = []
-        for doc in files_data:
-            bugs_sanity_checked.extend(doc.get("bugs_sanity_checked", []))
-
-        
-        uploads.append({
-    "upload_id": upload_id,
-    "upload_description": first_doc.get("upload_description"),
-    "original_filename": first_doc.get("original_filename"),
-    "user_id": str(first_doc.get("user_id")),
-    "username": first_doc.get("username"),
-    "timestamp": first_doc.get("timestamp"),
-    "num_files": len(files_data),
-    "file_names": [os.path.basename(doc.get("file", "")) for doc in files_data],
-    "bugs_sanity_checked": bugs_sanity_checked
-})
-    
-    uploads.sort(key=lambda x: x["timestamp"], reverse=True)
 
-    return {"project_id": str(user_data["project_id"]), "uploads": uploads}
+UPLOAD_FILE_FIELDS = (
+    "file",
+    "original_filename",
+    "bugs_original",
+    "bugs_sanity_checked",
+    "optimizations_original",
+    "optimizations_sanity_checked"
+)
+UPLOAD_HEADER_PROJECTION = {"upload_description": 1, "username": 1, "user_id": 1, "timestamp": 1}
+
 
+def upload_file_entry(doc, fields):
+    return {
+        key: doc.get(key) if key in ("file", "original_filename") else doc.get(key, [])
+        for key in fields
+    }
 
 
 @router.get("/upload/{upload_id}")
-def upload_details(upload_id: str, user_data: dict = Depends(get_current_user_data)):
+async def upload_details(
+    upload_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = None,
+    user_data: dict = Depends(get_current_user_data)
+):
+    """Upload header plus its files, ordered by file path.
+
+    fields=   comma-separated subset of UPLOAD_FILE_FIELDS for each file
+    limit=    page size; pass next_cursor back as cursor= for the next page
+    format=ndjson (or Accept: application/x-ndjson) streams the header, then
+              one file per line, then {"next_cursor": ...} after a full page
+    """
     project_id = ObjectId(user_data["project_id"])
+    fields = parse_fields(fields, UPLOAD_FILE_FIELDS)
+    projection = {"_id": 0, "file": 1, **{key: 1 for key in fields}}
+    after_file = decode_cursor(cursor, 1)[0] if cursor else None
+
+    async def load_header():
+        query = {"project_id": project_id, "upload_id": upload_id}
+        header = await repository.find_upload_summary(upload_id, project_id)
+        if header is not None:
+            num_files = header.get("num_files", 0)
+        else:
+            # Legacy upload without a summary: count its files.
+            num_files = None
+            header = await repository.find_first_file_analysis(query, UPLOAD_HEADER_PROJECTION)
 
-    
-    all_docs_cursor = file_analysis_collection.find({
-        "project_id": project_id,
-        "upload_id": upload_id
-    })
-
-    files_data = []
-    first_doc = None
-    for doc in all_docs_cursor:
-        if first_doc is None:
-            first_doc = doc
-
-        files_data.append({
-            "file": doc.get("file"),
-            "original_filename": doc.get("original_filename"),
-            "bugs_original": doc.get("bugs_original", []),
-            "bugs_sanity_checked": doc.get("bugs_sanity_checked", []),
-            "optimizations_original": doc.get("optimizations_original", []),
-            "optimizations_sanity_checked": doc.get("optimizations_sanity_checked", [])
-        })
-
-   
-    if first_doc is None:
-        print("[DEBUG] No docs found with project_id → retrying without project_id")
-        all_docs_cursor = file_analysis_collection.find({
-            "upload_id": upload_id
-        })
-
-        for doc in all_docs_cursor:
-            if first_doc is None:
-                first_doc = doc
-
-            files_data.append({
-                "file": doc.get("file"),
-                "original_filename": doc.get("original_filename"),
-                "bugs_original": doc.get("bugs_original", []),
-                "bugs_sanity_checked": doc.get("bugs_sanity_checked", []),
-                "optimizations_original": doc.get("optimizations_original", []),
-                "optimizations_sanity_checked": doc.get("optimizations_sanity_checked", [])
-            })
-
-    if first_doc is None:
-        return {"error": "Upload not found"}, 404
-
-   
-    response = {
-        "upload_id": upload_id,
-        "upload_description": first_doc.get("upload_description"),
-        "username": first_doc.get("username"),
-        "user_id": str(first_doc.get("user_id")),
-        "timestamp": first_doc.get("timestamp"),
-        "num_files": len(files_data),
-        "files": files_data
-    }
+        if header is None:
+            print("[DEBUG] No docs found with project_id → retrying without project_id")
+            query = {"upload_id": upload_id}
+            header = await repository.find_first_file_analysis(query, UPLOAD_HEADER_PROJECTION)
+
+        if header is None:
+            return query, None
+
+        if num_files is None:
+            num_files = await repository.count_file_analysis(query)
+
+        return query, {
+            "upload_id": upload_id,
+            "upload_description": header.get("upload_description"),
+            "username": header.get("username"),
+            "user_id": str(header.get("user_id")),
+            "timestamp": header.get("timestamp"),
+            "num_files": num_files
+        }
+
+    if wants_ndjson(request, format):
+        query, response = await load_header()
+        if response is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+
+        async def lines():
+            yield response
+            count, last_file = 0, None
+            async for doc in repository.iter_file_analysis(query, projection, limit, after_file):
+                count, last_file = count + 1, doc["file"]
+                yield upload_file_entry(doc, fields)
+            if limit and count == limit:
+                yield {"next_cursor": encode_cursor(last_file)}
+
+        return ndjson_response(lines())
+
+    async def produce():
+        query, response = await load_header()
+        if response is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+
+        docs = await repository.list_file_analysis_page(query, projection, limit, after_file)
+        response["files"] = [upload_file_entry(doc, fields) for doc in docs]
+        if limit:
+            response["next_cursor"] = encode_cursor(docs[-1]["file"]) if len(docs) == limit else None
+        return response, None
 
-    return response
+    return await response_cache.respond(request, upload_id, produce, scope=str(project_id))
 
 @router.get("/project/{project_id}")
-def get_project_by_id(project_id: str):
+async def get_project_by_id(project_id: str):
     try:
-        project = projects_collection.find_one({"_id": ObjectId(project_id)})
+        project = await repository.find_project(project_id)
 
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
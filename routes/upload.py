@@ -1,58 +1,86 @@
 import traceback
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
-from utils.file_extractor import extract_zip, is_code_file, is_valid_code_file
-from utils.constants import JUNK_FOLDERS
+from utils.file_extractor import extract_zip, is_code_file, save_upload_file, source_path_from_relative, normalize_source_path
+from utils.file_manifest import is_valid_code_entry, job_manifest, read_lines, remove_line_index, split_lines
+from utils.constants import MAX_UPLOAD_BYTES
 import os
 import json
 import uuid
 import shutil
+import hashlib
 from services.project_summary import get_project_summary, parse_project_summary
-from services.gpt_analysis import call_gpt_analyze_chunk, run_sanity_check_on_bugs
+from services.import_graph import group_files
+from services.chunk_packer import ANALYSIS_MAX_SPLITS, pack_chunks, merge_small_groups, split_request
+from services.gpt_analysis import call_gpt_analyze_chunk, once_per_bug
+from services.sanity_stage import sanity_batcher
+from services.llm_scheduler import set_upload_context
 import asyncio
 from dotenv import load_dotenv
-from services.parser import parse_outputs
-from db.models import save_to_mongo
-from routes.progress_ws import connected_websockets
+from services.parser import match_finding_file, split_outputs_by_file, parse_outputs, merge_static_results
+from services.static_checks import STATIC_SKIP_TRIVIAL, run_static_checks, static_hints
+from utils.metrics import increment
+from db.models import save_to_mongo, save_partial_bug
+from db import repository
+from db.upload_summaries import add_to_upload_summary, summary_header
+from services.response_cache import response_cache
+from bson import ObjectId
+from services.analysis_cache import get_cached_analysis, store_cached_analysis, evict_analysis_cache
+from services.job_queue import (
+    WORKER_ID, JOB_LEASE_SECONDS, JOB_SWEEP_SECONDS, enqueue_job, claim_job, heartbeat_job,
+    checkpoint_group, complete_job, fail_job, fail_exhausted_jobs
+)
+from services.progress_bus import publish_progress
 from fastapi import Request
 from utils.auth_utils import get_current_user_data
 load_dotenv()
 router = APIRouter()
 TEMP_FOLDER = "temp_uploads"
 
-from routes.progress_ws import connected_websockets
+# "inline" runs the analysis job in this API process right after the upload;
+# "worker" only enqueues it for `python -m worker` processes to pick up.
+# Workers must share TEMP_FOLDER with the API pods.
+ANALYSIS_EXECUTOR = os.getenv("ANALYSIS_EXECUTOR", "inline")
 
-async def send_progress(upload_id: str, message: str, progress: int = None):
-    if upload_id not in connected_websockets:
-        print(f"[WebSocket] No active clients for upload_id={upload_id}")
-        return
-    
-    disconnected_clients = []
-    for ws in connected_websockets[upload_id]:
-        try:
-            payload = {"status": message}
-            if progress is not None:
-                payload["progress"] = progress
-            await ws.send_json(payload)
-        except:
-            disconnected_clients.append(ws)
-    
+# "llm" asks GPT to group files from their previews; "local" groups them by
+# their resolved imports without any LLM call. Overridable per upload.
+DEFAULT_GROUPING_MODE = os.getenv("GROUPING_MODE", "llm")
+GROUPING_MODES = {"llm", "local"}
 
-    for ws in disconnected_clients:
-        connected_websockets[upload_id].remove(ws)
-    
+# A delta upload copies results only from a finished base upload, and only
+# documents that are final (not streamed partials or awaiting the sanity pass).
+FINISHED_JOB_STATUSES = {"done", "completed_with_errors"}
+FINAL_FILE_ANALYSIS = {"partial": {"$ne": True}, "sanity_pending": {"$ne": True}}
 
-    if len(connected_websockets[upload_id]) == 0:
-        del connected_websockets[upload_id]
+async def send_progress(upload_id: str, message: str, progress: int = None, bug: dict = None):
+    payload = {"status": message}
+    if progress is not None:
+        payload["progress"] = progress
+    if bug is not None:
+        payload["bug"] = bug
+    await publish_progress(upload_id, payload)
 
 
 @router.post("/")
 async def upload_project(
     request: Request,
     upload_description: str = Form(""),  
-    files: list[UploadFile] = File(...),
+    files: list[UploadFile] = File([]),
+    base_upload_id: str = Form(""),
+    deleted_files: str = Form(""),
+    grouping_mode: str = Form(DEFAULT_GROUPING_MODE),
     user_data: dict = Depends(get_current_user_data)
 ):
+    zip_extract_paths = []
+    normal_file_paths = []
+    archive_paths = []
+    # Until the job is enqueued the temp files belong to this request; after
+    # that, to whoever runs the job.
+    handed_off = False
     try:
+        if not files and not base_upload_id:
+            raise HTTPException(status_code=400, detail="No files uploaded.")
+        if grouping_mode not in GROUPING_MODES:
+            raise HTTPException(status_code=400, detail=f"grouping_mode must be one of {sorted(GROUPING_MODES)}.")
        
         user_id = user_data["user_id"]
         project_id = user_data["project_id"]
@@ -60,70 +88,84 @@ async def upload_project(
         #Main logic
         os.makedirs(TEMP_FOLDER, exist_ok=True)
         upload_id = str(uuid.uuid4())
+        set_upload_context(upload_id, user_data["role"])
         all_code_files = []
-        zip_extract_paths = []
-        normal_file_paths = []
         file_previews = []
+        uploaded_hashes = []
+        total_bytes = 0
 
         for uploaded_file in files:
             file_id = str(uuid.uuid4())
 
             if uploaded_file.filename.endswith(".zip"):
                 zip_temp_path = os.path.join(TEMP_FOLDER, f"{file_id}_{uploaded_file.filename}")
-                with open(zip_temp_path, "wb") as f:
-                    content = await uploaded_file.read()
-                    f.write(content)
+                archive_paths.append(zip_temp_path)
+                archive = await save_upload_file(uploaded_file, zip_temp_path, MAX_UPLOAD_BYTES - total_bytes, text=False)
+                total_bytes += archive["size"]
+                uploaded_hashes.append({"filename": uploaded_file.filename, "sha256": archive["sha256"], "size": archive["size"]})
 
                 extract_path = os.path.join(TEMP_FOLDER, file_id)
-                extract_zip(zip_temp_path, extract_path)
-
-                for root, dirs, files_in_zip in os.walk(extract_path):
-                    dirs[:] = [d for d in dirs if d not in JUNK_FOLDERS]
-                    for file_in_zip in files_in_zip:
-                        file_full_path = os.path.join(root, file_in_zip)
-                        if is_code_file(file_full_path) and is_valid_code_file(file_full_path):
-                            all_code_files.append(file_full_path)
-                            with open(file_full_path, "r", encoding="utf-8", errors="ignore") as f:
-                                content = f.read(500)
-                            relative_name = os.path.relpath(file_full_path, start=TEMP_FOLDER).replace("\\", "/")
-                            file_previews.append({
-                                "filename": file_full_path,
-                                "display_name": relative_name,
-                                "original_name": file_in_zip,
-                                "preview": content
-                            })
-
                 zip_extract_paths.append(extract_path)
-                os.remove(zip_temp_path)
+                manifest = await asyncio.to_thread(extract_zip, zip_temp_path, extract_path)
+
+                for file_full_path, entry in manifest.items():
+                    if is_valid_code_entry(entry):
+                        all_code_files.append(file_full_path)
+                        relative_name = os.path.relpath(file_full_path, start=TEMP_FOLDER).replace("\\", "/")
+                        file_previews.append({
+                            "filename": file_full_path,
+                            "display_name": relative_name,
+                            "original_name": os.path.basename(file_full_path),
+                            **entry
+                        })
+
+                await asyncio.to_thread(os.remove, zip_temp_path)
+                archive_paths.remove(zip_temp_path)
 
             else:
-                normal_file_path = os.path.join(TEMP_FOLDER, f"{file_id}_{uploaded_file.filename}")
-                with open(normal_file_path, "wb") as f:
-                    content_bytes = await uploaded_file.read()
-                    f.write(content_bytes)
-
-                normal_file_paths.append(normal_file_path)
-
-                with open(normal_file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    content_text = f.read()
-                    file_lines = content_text.splitlines()
+                # Names may carry folders ("src/app.py"); keep them, under the
+                # file's own directory like a zip member.
+                normal_file_path = os.path.join(TEMP_FOLDER, file_id, normalize_source_path(uploaded_file.filename) or "upload")
+                normal_file_paths.append(os.path.join(TEMP_FOLDER, file_id))
+                os.makedirs(os.path.dirname(normal_file_path), exist_ok=True)
+                entry = await save_upload_file(uploaded_file, normal_file_path, MAX_UPLOAD_BYTES - total_bytes, text=is_code_file(normal_file_path))
+                total_bytes += entry["size"]
+                uploaded_hashes.append({"filename": uploaded_file.filename, "sha256": entry["sha256"], "size": entry["size"]})
 
                 if is_code_file(normal_file_path):
                     all_code_files.append(normal_file_path)
                     relative_name = os.path.relpath(normal_file_path, start=TEMP_FOLDER).replace("\\", "/")
-                    preview_text = content_text[:500]
                     file_previews.append({
                         "filename": normal_file_path,
                         "display_name": relative_name,
                         "original_name": uploaded_file.filename,
-                        "preview": preview_text
+                        **entry
                     })
 
         await send_progress(upload_id, "Upload complete ", progress=5)
-        await send_progress(upload_id, "Running Project Summary...", progress=10)
 
-        summary_text = await get_project_summary(file_previews)
-        dependencies, connected_groups = parse_project_summary(summary_text)
+        await repository.create_upload_summary(upload_id, summary_header(
+            user_id, username, project_id, upload_description,
+            files[0].filename if files else None
+        ))
+
+        carried_over = 0
+        if base_upload_id:
+            carried_over = await apply_delta_upload(
+                base_upload_id, upload_id, file_previews, parse_deleted_files(deleted_files),
+                user_id, username, project_id, upload_description
+            )
+            await send_progress(upload_id, f"Carried over {carried_over} unchanged file(s) from base upload", progress=8)
+
+        if not file_previews:
+            connected_groups = []
+        elif grouping_mode == "local":
+            await send_progress(upload_id, "Building Import Graph...", progress=10)
+            dependencies, connected_groups = await asyncio.to_thread(group_files, file_previews)
+        else:
+            await send_progress(upload_id, "Running Project Summary...", progress=10)
+            summary_text = await get_project_summary(file_previews)
+            dependencies, connected_groups = parse_project_summary(summary_text)
 
         display_name_to_full_path = {
             file_obj["display_name"]: file_obj["filename"]
@@ -140,87 +182,344 @@ async def upload_project(
                 else:
                     print(f"[WARNING] No matching full path for: {display_name}")
             connected_groups_full_paths.append(group_full_paths)
+        connected_groups_full_paths = merge_small_groups(connected_groups_full_paths)
         await send_progress(upload_id, f"Connected Groups ready — {len(connected_groups_full_paths)} groups", progress=15)
 
 
-        asyncio.create_task(run_analysis_task(
-            upload_id,
-            connected_groups_full_paths,
-            zip_extract_paths + normal_file_paths,
-            file_previews,
-            user_id,
-            username,
-            project_id,
-            upload_description
-        ))
+        job_id = await asyncio.to_thread(enqueue_job, upload_id, {
+            "connected_groups": connected_groups_full_paths,
+            "extract_paths": zip_extract_paths + normal_file_paths,
+            "file_previews": [
+                {"filename": f["filename"], "original_name": f.get("original_name", ""), **job_manifest(f)}
+                for f in file_previews
+            ],
+            "user_id": user_id,
+            "username": username,
+            "role": user_data["role"],
+            "project_id": project_id,
+            "upload_description": upload_description,
+            "uploaded_files": uploaded_hashes,
+            "base_upload_id": base_upload_id or None
+        })
+        handed_off = True
+
+        if ANALYSIS_EXECUTOR == "inline":
+            job = await asyncio.to_thread(claim_job, WORKER_ID, job_id=job_id)
+            if job:
+                asyncio.create_task(run_analysis_job(job))
 
         return {
             "message": "Upload started",
             "upload_id": upload_id,
             "groups": len(connected_groups_full_paths),
-            "files": [f for group in connected_groups for f in group]
+            "files": [f for group in connected_groups for f in group],
+            "uploaded_files": uploaded_hashes,
+            "carried_over_files": carried_over
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
+        traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if not handed_off:
+            await asyncio.to_thread(cleanup_temp_paths, archive_paths + zip_extract_paths + normal_file_paths)
+
+
+@router.get("/{upload_id}/status")
+async def upload_status(upload_id: str, user_data: dict = Depends(get_current_user_data)):
+    job = await repository.get_job_status(upload_id)
+    if not job or job["payload"]["project_id"] != user_data["project_id"]:
+        raise HTTPException(status_code=404, detail="Upload not found.")
+
+    return {
+        "upload_id": upload_id,
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "completed_groups": len(job.get("completed_groups", [])),
+        "failed_groups": job.get("failed_groups", []),
+        "error": job.get("error")
+    }
+
+
+def parse_deleted_files(deleted_files):
+    """Accept a JSON list or a comma/newline separated list of source paths."""
+    deleted_files = deleted_files.strip()
+    if not deleted_files:
+        return set()
+    if deleted_files.startswith("["):
+        paths = json.loads(deleted_files)
+    else:
+        paths = deleted_files.replace("\n", ",").split(",")
+    return {normalize_source_path(path) for path in paths if normalize_source_path(path)}
+
+
+def match_base_paths(paths, base_paths):
+    """The base upload's paths that `paths` refer to.
+
+    A path matches a base path exactly or, if only one base path fits, by its
+    trailing segments: "app.py" matches "src/app.py" and "proj/src/app.py"
+    matches "src/app.py", so single files and zips with or without a wrapper
+    folder line up with the base upload.
+    """
+    by_name = {}
+    for base_path in base_paths:
+        by_name.setdefault(os.path.basename(base_path), []).append(base_path)
+
+    matched = set()
+    for path in paths:
+        if path in base_paths:
+            matched.add(path)
+            continue
+        candidates = [
+            base_path for base_path in by_name.get(os.path.basename(path), [])
+            if base_path.endswith("/" + path) or path.endswith("/" + base_path)
+        ]
+        if len(candidates) == 1:
+            matched.add(candidates[0])
+        elif candidates:
+            print(f"[Delta] {path} matches {len(candidates)} base files — none of them is replaced")
+    return matched
+
+
+async def apply_delta_upload(base_upload_id, upload_id, file_previews, deleted_paths, user_id, username, project_id, upload_description):
+    """Carry every base file that was neither re-uploaded nor deleted into the new upload.
+
+    Only a finished base upload is used, so no partial or unreviewed results
+    are copied.
+    """
+    base_job = await repository.get_job_status(base_upload_id)
+    if base_job is not None and base_job["status"] not in FINISHED_JOB_STATUSES:
+        raise HTTPException(status_code=409, detail="Base upload is still being analysed.")
+
+    base_docs = await repository.list_file_analysis(
+        {"upload_id": base_upload_id, "project_id": ObjectId(project_id), **FINAL_FILE_ANALYSIS},
+        {"file": 1, "source_path": 1, "bugs_sanity_checked.priority": 1}
+    )
+    if not base_docs:
+        raise HTTPException(status_code=404, detail="Base upload not found in this project.")
+
+    base_path_of = {
+        doc["_id"]: normalize_source_path(doc.get("source_path") or source_path_from_relative(doc["file"]))
+        for doc in base_docs
+    }
+    base_paths = set(base_path_of.values())
+    changed_paths = {normalize_source_path(source_path_from_relative(f["display_name"])) for f in file_previews}
+    skipped_paths = match_base_paths(changed_paths | deleted_paths, base_paths)
+
+    carried_docs = [doc for doc in base_docs if base_path_of[doc["_id"]] not in skipped_paths]
+
+    carried = await repository.carry_over_file_analysis(
+        base_upload_id, upload_id, [doc["_id"] for doc in carried_docs], user_id, username, upload_description
+    )
+    if carried:
+        await response_cache.invalidate(upload_id)
+        await repository.add_to_upload_summary(
+            upload_id, "carry_over",
+            [(doc["file"], doc.get("bugs_sanity_checked", [])) for doc in carried_docs],
+            summary_header(user_id, username, project_id, upload_description)
+        )
+    return carried
+
+
+def cleanup_temp_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.isfile(path):
+            os.remove(path)
+            remove_line_index(path)
+
+    if os.path.exists(TEMP_FOLDER) and not os.listdir(TEMP_FOLDER):
+        shutil.rmtree(TEMP_FOLDER)
+
+async def keep_job_alive(job_id, worker_id):
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        if not await asyncio.to_thread(heartbeat_job, job_id, worker_id):
+            print(f"[JobQueue] Lost lease on job {job_id}")
+            return
+
+
+async def run_analysis_job(job, worker_id=WORKER_ID):
+    payload = job["payload"]
+    set_upload_context(job["upload_id"], payload.get("role", "developer"))
+    heartbeat_task = asyncio.create_task(keep_job_alive(job["_id"], worker_id))
 
-async def run_analysis_task(upload_id, connected_groups, extract_paths, file_previews, user_id, username, project_id, upload_description):
     try:
-        gpt_results = []
-        tasks = []
+        failed_groups = await run_analysis_task(
+            job["upload_id"],
+            payload["connected_groups"],
+            payload["file_previews"],
+            payload["user_id"],
+            payload["username"],
+            payload["project_id"],
+            payload["upload_description"],
+            job_id=job["_id"],
+            completed_groups=job.get("completed_groups", []),
+            worker_id=worker_id
+        )
+        await asyncio.to_thread(complete_job, job["_id"], worker_id, failed_groups)
+        cleanup_temp_paths(payload["extract_paths"])
+        if failed_groups:
+            await send_progress(job["upload_id"], f"DONE with {len(failed_groups)} failed group(s) ⚠️", progress=100)
+        else:
+            await send_progress(job["upload_id"], "DONE 🚀", progress=100)
 
-      
-        full_path_to_original_name = {
-            file_obj["filename"]: file_obj.get("original_name", "")
-            for file_obj in file_previews
-        }
+    except Exception as e:
+        traceback.print_exc()
+        if await asyncio.to_thread(fail_job, job["_id"], e, worker_id) == "failed":
+            cleanup_temp_paths(payload["extract_paths"])
 
-        for i, group in enumerate(connected_groups):
-            tasks.append(
-                analyze_one_group(
-                    upload_id,
-                    group,
-                    i,
-                    len(connected_groups),
-                    gpt_results,
-                    full_path_to_original_name,
-                    user_id,
-                    username,
-                    project_id,
-                    upload_description
-                )
-            )
+    finally:
+        heartbeat_task.cancel()
 
-        await asyncio.gather(*tasks)
 
-        
-        for path in extract_paths:
-            if os.path.isdir(path):
-                shutil.rmtree(path)
-            elif os.path.isfile(path):
-                os.remove(path)
+async def fail_abandoned_jobs():
+    for job in await asyncio.to_thread(fail_exhausted_jobs):
+        await asyncio.to_thread(cleanup_temp_paths, job.get("payload", {}).get("extract_paths", []))
 
-        if os.path.exists(TEMP_FOLDER) and not os.listdir(TEMP_FOLDER):
-            shutil.rmtree(TEMP_FOLDER)
 
-        await send_progress(upload_id, "DONE 🚀", progress=100)
+async def sweep_jobs():
+    """Inline mode: run jobs nobody is running.
 
-    except Exception as e:
-        traceback.print_exc()
+    Picks up queued jobs and jobs whose lease expired (the API process running
+    them crashed or restarted), resuming from their last checkpoint, and fails
+    the ones that are out of attempts. Every API process sweeps; claim_job
+    hands each job to exactly one of them.
+    """
+    while True:
+        try:
+            await fail_abandoned_jobs()
+            while True:
+                job = await asyncio.to_thread(claim_job, WORKER_ID)
+                if job is None:
+                    break
+                print(f"[JobQueue] Reclaimed job for upload_id={job['upload_id']} (attempt {job['attempts']})")
+                asyncio.create_task(run_analysis_job(job))
+        except Exception:
+            traceback.print_exc()
+        await asyncio.sleep(JOB_SWEEP_SECONDS)
+
+
+async def analyze_request(request, on_bug, hints_for, splits=0):
+    """Analyze one packed request; returns [(request, content, finish_reason)].
+
+    Output cut off at max_tokens is not half-parsed: the request is split in
+    two and each half retried, up to ANALYSIS_MAX_SPLITS times.
+    """
+    content, finish_reason = await call_gpt_analyze_chunk(request, on_bug=on_bug, hints=hints_for(request))
+    if finish_reason != "length" or splits >= ANALYSIS_MAX_SPLITS:
+        return [(request, content, finish_reason)]
+
+    halves = split_request(request)
+    if halves is None:
+        return [(request, content, finish_reason)]
+
+    increment("analysis.truncated_splits")
+    print(f"[ChunkPacker] Output truncated — retrying {len(request)} chunk(s) as two requests")
+    results = await asyncio.gather(*(analyze_request(half, on_bug, hints_for, splits + 1) for half in halves))
+    return [result for half_results in results for result in half_results]
+
+
+async def run_analysis_task(upload_id, connected_groups, file_previews, user_id, username, project_id, upload_description, job_id=None, completed_groups=(), worker_id=WORKER_ID):
+    gpt_results = []
+    tasks = []
+
+    full_path_to_original_name = {
+        file_obj["filename"]: file_obj.get("original_name", "")
+        for file_obj in file_previews
+    }
+    manifest = {file_obj["filename"]: file_obj for file_obj in file_previews}
+
+    if completed_groups:
+        print(f"[JobQueue] Resuming upload_id={upload_id} — {len(completed_groups)}/{len(connected_groups)} groups already done")
+
+    for i, group in enumerate(connected_groups):
+        if i in completed_groups:
+            continue
+        tasks.append(
+            analyze_one_group(
+                upload_id,
+                group,
+                i,
+                len(connected_groups),
+                gpt_results,
+                full_path_to_original_name,
+                user_id,
+                username,
+                project_id,
+                upload_description,
+                job_id=job_id,
+                manifest=manifest,
+                worker_id=worker_id
+            )
+        )
 
-async def analyze_one_group(upload_id, group, group_index, total_groups, gpt_results, full_path_to_original_name, user_id, username, project_id, upload_description):
+    # Lets the sanity batcher send a batch as soon as no other group of this
+    # upload can still join it.
+    sanity_batcher.track_groups(upload_id, len(tasks))
+
+    async def run_group(task):
+        try:
+            return await task
+        finally:
+            sanity_batcher.group_finished(upload_id)
+
+    results = await asyncio.gather(*(run_group(task) for task in tasks))
+    return [failure for failure in results if failure is not None]
+
+async def analyze_one_group(upload_id, group, group_index, total_groups, gpt_results, full_path_to_original_name, user_id, username, project_id, upload_description, job_id=None, manifest=None, worker_id=WORKER_ID):
     try:
         group_progress = 15 + int((group_index / total_groups) * 70)
         await send_progress(upload_id, f"Analyzing Group {group_index + 1}/{total_groups}...", progress=group_progress)
 
         file_chunks = []
+        cached_results = {}
+        uncached_hashes = {}
+        uncached_lines = {}
+        # Files with a request whose output was unusable: saved with what
+        # there is, flagged, and never cached as a clean result.
+        failed_files = {}
+        writes = []
         for file_entry in group:
             if isinstance(file_entry, tuple):
                 file_name, file_lines = file_entry
+                content_hash = hashlib.sha256("".join(file_lines).encode("utf-8")).hexdigest()
+            elif manifest and manifest.get(file_entry, {}).get("sha256"):
+                # Hashed while it was written; cache hits never touch the file.
+                file_name = file_entry
+                content_hash = manifest[file_name]["sha256"]
+                file_lines = None
             else:
                 file_name = file_entry
-                with open(file_name, "r", encoding="utf-8") as f:
-                    file_lines = f.readlines()
+                with open(file_name, "rb") as f:
+                    raw = f.read()
+                content_hash = hashlib.sha256(raw).hexdigest()
+                file_lines = split_lines(raw.decode("utf-8"))
+
+            cached = await asyncio.to_thread(get_cached_analysis, project_id, content_hash)
+            if cached is not None:
+                cached_results[file_name] = cached
+                continue
+            if file_lines is None:
+                file_lines = await asyncio.to_thread(read_lines, file_name, manifest[file_name])
+            uncached_hashes[file_name] = content_hash
+            uncached_lines[file_name] = file_lines
+
+        # Deterministic checks first: their findings become prompt hints, and
+        # trivial files (constants, re-exports, stubs) never reach GPT.
+        static_results = await run_static_checks([
+            (file_name, "".join(file_lines)) for file_name, file_lines in uncached_lines.items()
+        ])
+        static_only = {}
+        for file_name, file_lines in uncached_lines.items():
+            static_result = static_results.get(file_name)
+            if STATIC_SKIP_TRIVIAL and static_result is not None and static_result["trivial"]:
+                static_only[file_name] = static_result
+                del uncached_hashes[file_name]
+                continue
 
             total_lines = len(file_lines)
 
@@ -240,49 +539,112 @@ async def analyze_one_group(upload_id, group, group_index, total_groups, gpt_res
                 chunk_lines = file_lines[start_line:end_line]
                 file_chunks.append((file_name, chunk_lines))
 
-       
-        analysis_output = await call_gpt_analyze_chunk(file_chunks)
+        if static_results:
+            static_findings = sum(len(result["findings"]) for result in static_results.values())
+            increment("static.findings", static_findings)
+            increment("static.llm_skipped_files", len(static_only))
+            await send_progress(upload_id, f"Static checks on Group {group_index + 1}/{total_groups}: {static_findings} finding(s), {len(static_only)} trivial file(s) skip GPT", progress=group_progress)
+
+        parsed_by_file = {}
+        if file_chunks:
+            packed_requests = pack_chunks(file_chunks)
+            if len(packed_requests) > 1:
+                print(f"[ChunkPacker] Group {group_index + 1}/{total_groups} split into {len(packed_requests)} requests")
+
+            def partial_bug_saver(request):
+                request_files = list(dict.fromkeys(file_name for file_name, _ in request))
+
+                async def on_bug(bug):
+                    file_name = match_finding_file(bug.get("file"), request_files) or request_files[0]
+                    relative_file_name = os.path.relpath(file_name, start=TEMP_FOLDER).replace("\\", "/")
+                    writes.append(save_partial_bug(
+                        upload_id, relative_file_name, bug, user_id, username, project_id,
+                        full_path_to_original_name.get(file_name, ""), upload_description,
+                        source_path_from_relative(relative_file_name)
+                    ))
+                    await send_progress(upload_id, f"Bug found in Group {group_index + 1}/{total_groups}", bug=bug)
+
+                return on_bug
+
+            def request_hints(request):
+                return static_hints(list(dict.fromkeys(file_name for file_name, _ in request)), static_results)
+
+            analysis_outputs = await asyncio.gather(*(
+                analyze_request(request, once_per_bug(partial_bug_saver(request)), request_hints)
+                for request in packed_requests
+            ))
 
-        
-        try:
-            
-            if analysis_output.strip().startswith("```json"):
-                analysis_output = analysis_output.strip().split("```json")[1].split("```")[0].strip()
-            elif analysis_output.strip().startswith("```"):
-                analysis_output = analysis_output.strip().split("```")[1].split("```")[0].strip()
-
-            analysis_data = json.loads(analysis_output)
-        except Exception as e:
-            print(f"[Parse Error] Could not parse GPT analysis output JSON: {e}")
             analysis_data = { "bugs": [], "optimizations": [] }
+            for request, analysis_output, finish_reason in (output for outputs in analysis_outputs for output in outputs):
+                request_files = list(dict.fromkeys(file_name for file_name, _ in request))
+                if finish_reason == "length":
+                    print(f"[Analysis] Output still truncated for {len(request_files)} file(s) after splitting — marking them failed")
+                    failed_files.update(dict.fromkeys(request_files, "Analysis output was truncated"))
+                    continue
+                try:
+                    
+                    if analysis_output.strip().startswith("```json"):
+                        analysis_output = analysis_output.strip().split("```json")[1].split("```")[0].strip()
+                    elif analysis_output.strip().startswith("```"):
+                        analysis_output = analysis_output.strip().split("```")[1].split("```")[0].strip()
+
+                    request_data = json.loads(analysis_output)
+                except Exception as e:
+                    print(f"[Parse Error] Could not parse GPT analysis output JSON: {e}")
+                    failed_files.update(dict.fromkeys(request_files, "Analysis output could not be parsed"))
+                    continue
+
+                analysis_data["bugs"].extend(request_data.get("bugs", []))
+                analysis_data["optimizations"].extend(request_data.get("optimizations", []))
 
-        
-        bugs_json_string = json.dumps(analysis_data.get("bugs", []), indent=2)
-
-        await send_progress(upload_id, f"Running Sanity Check on Group {group_index + 1}/{total_groups}...", progress=group_progress + 5)
-
-        sanity_checked_output = await run_sanity_check_on_bugs(group[0], bugs_json_string)
-
-        
-        try:
-            if sanity_checked_output.strip().startswith("```json"):
-                sanity_checked_output = sanity_checked_output.strip().split("```json")[1].split("```")[0].strip()
-            elif sanity_checked_output.strip().startswith("```"):
-                sanity_checked_output = sanity_checked_output.strip().split("```")[1].split("```")[0].strip()
-
-            sanity_checked_data = json.loads(sanity_checked_output)
-        except Exception as e:
-            print(f"[Parse Error] Could not parse Sanity Check output JSON: {e}")
-            sanity_checked_data = { "bugs": [] }
-
-        gpt_results.append({
-            "files": group,
-            "analysis_output": analysis_data,
-            "sanity_checked_output": sanity_checked_data
-        })
+            
+            analysis_files = [
+                os.path.relpath(file_name, start=TEMP_FOLDER).replace("\\", "/")
+                for file_name in uncached_hashes
+            ]
+
+            if analysis_data["bugs"]:
+                # Make the findings visible now; the sanity review may be batched
+                # with other groups and lands a little later.
+                pending_by_file = split_outputs_by_file(analysis_data, None, list(uncached_hashes))
+                for file_name, relative_file_name in zip(uncached_hashes, analysis_files):
+                    pending_data = {**merge_static_results(pending_by_file[file_name], static_results.get(file_name)), "sanity_pending": True}
+                    writes.append(save_to_mongo(upload_id, relative_file_name, pending_data, user_id, username, project_id, full_path_to_original_name.get(file_name, ""), upload_description, source_path_from_relative(relative_file_name)))
+
+                await send_progress(upload_id, f"Running Sanity Check on Group {group_index + 1}/{total_groups}...", progress=group_progress + 5)
+
+            sanity_checked_data = await sanity_batcher.review(analysis_files, analysis_data["bugs"])
+            if not sanity_checked_data["reviewed"]:
+                # Keep the findings, but don't present them as reviewed or cache them.
+                for file_name in uncached_hashes:
+                    failed_files.setdefault(file_name, "Sanity review failed")
+
+            gpt_results.append({
+                "files": group,
+                "analysis_output": analysis_data,
+                "sanity_checked_output": sanity_checked_data
+            })
+
+            parsed_by_file = split_outputs_by_file(analysis_data, sanity_checked_data, list(uncached_hashes))
+            for file_name, parsed in parsed_by_file.items():
+                merge_static_results(parsed, static_results.get(file_name))
+                if file_name in failed_files:
+                    parsed["analysis_error"] = failed_files[file_name]
+                if not sanity_checked_data["reviewed"]:
+                    parsed["sanity_pending"] = True
+        else:
+            print(f"[AnalysisCache] Group {group_index + 1}/{total_groups} served from cache and static checks only")
+
+        for file_name, static_result in static_only.items():
+            parsed_by_file[file_name] = merge_static_results(
+                parse_outputs({"bugs": [], "optimizations": []}, {"bugs": [], "optimizations": []}),
+                static_result,
+                llm_skipped=True
+            )
 
         await send_progress(upload_id, f"Saving Group {group_index + 1} to MongoDB...", progress=group_progress + 10)
 
+        summary_files = []
         for file_in_group in group:
             if isinstance(file_in_group, tuple):
                 file_name = file_in_group[0]
@@ -292,10 +654,55 @@ async def analyze_one_group(upload_id, group, group_index, total_groups, gpt_res
             relative_file_name = os.path.relpath(file_name, start=TEMP_FOLDER).replace("\\", "/")
             original_name = full_path_to_original_name.get(file_name, "")
 
-            parsed_data = parse_outputs(analysis_data, sanity_checked_data)
-            save_to_mongo(upload_id, relative_file_name, parsed_data, user_id, username, project_id, original_name, upload_description)
+            source_path = source_path_from_relative(relative_file_name)
+
+            final_data = cached_results[file_name] if file_name in cached_results else parsed_by_file[file_name]
+            summary_files.append((relative_file_name, final_data["bugs_sanity_checked"]))
+
+            if file_name in cached_results:
+                writes.append(save_to_mongo(upload_id, relative_file_name, cached_results[file_name], user_id, username, project_id, original_name, upload_description, source_path))
+            else:
+                writes.append(save_to_mongo(upload_id, relative_file_name, parsed_by_file[file_name], user_id, username, project_id, original_name, upload_description, source_path))
+                if file_name in uncached_hashes and file_name not in failed_files:
+                    cache_write = store_cached_analysis(project_id, uncached_hashes[file_name], parsed_by_file[file_name])
+                    if cache_write is not None:
+                        writes.append(cache_write)
+
+        # The group only counts as done (and checkpointed) once its results
+        # have actually landed in Mongo.
+        await asyncio.gather(*writes)
+        await asyncio.to_thread(
+            add_to_upload_summary, upload_id, f"group:{group_index}", summary_files,
+            summary_header(user_id, username, project_id, upload_description)
+        )
+
+        if uncached_hashes:
+            await asyncio.to_thread(evict_analysis_cache, project_id)
+
+        if job_id is not None and not await asyncio.to_thread(checkpoint_group, job_id, group_index, worker_id):
+            print(f"[JobQueue] Lost lease on job {job_id} — Group {group_index + 1}/{total_groups} not checkpointed")
 
         await asyncio.sleep(0.2)
+        if failed_files:
+            await send_progress(upload_id, f"Group {group_index + 1}/{total_groups}: analysis failed for {len(failed_files)} file(s)")
+            return {
+                "group_index": group_index,
+                "files": [
+                    os.path.relpath(file_name, start=TEMP_FOLDER).replace("\\", "/")
+                    for file_name in failed_files
+                ],
+                "error": "; ".join(sorted(set(failed_files.values())))
+            }
+        return None
 
     except Exception as e:
         traceback.print_exc()
+        await send_progress(upload_id, f"Group {group_index + 1}/{total_groups} failed: {type(e).__name__}")
+        return {
+            "group_index": group_index,
+            "files": [
+                os.path.relpath(f[0] if isinstance(f, tuple) else f, start=TEMP_FOLDER).replace("\\", "/")
+                for f in group
+            ],
+            "error": f"{type(e).__name__}: {e}"
+        }
@@ -0,0 +1,78 @@
+# services/analysis_cache.py
+
+import os
+from bson import ObjectId
+from datetime import datetime, timezone
+from db.models import analysis_cache_collection, analysis_cache_writer
+from services.gpt_analysis import ANALYSIS_MODEL, ANALYSIS_PROMPT_VERSION
+from services.static_checks import STATIC_CHECKS_VERSION
+from utils.metrics import increment
+
+# Per-file analysis results keyed by (project, content hash, model/prompt/static
+# checks version). Entries expire through the TTL index on last_used_at and each
+# project is trimmed to ANALYSIS_CACHE_MAX_ENTRIES, least recently used first.
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 20000))
+ANALYSIS_CACHE_VERSION = f"{ANALYSIS_MODEL}:{ANALYSIS_PROMPT_VERSION}:static-{STATIC_CHECKS_VERSION}"
+
+
+def _cache_key(project_id, content_hash):
+    return {
+        "project_id": ObjectId(project_id),
+        "content_hash": content_hash,
+        "version": ANALYSIS_CACHE_VERSION
+    }
+
+
+def get_cached_analysis(project_id, content_hash):
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+
+    doc = analysis_cache_collection.find_one_and_update(
+        _cache_key(project_id, content_hash),
+        {"$set": {"last_used_at": datetime.now(timezone.utc)}, "$inc": {"hits": 1}},
+        projection={"parsed_data": 1}
+    )
+
+    if doc is None:
+        increment("analysis_cache.misses")
+        return None
+
+    increment("analysis_cache.hits")
+    return doc["parsed_data"]
+
+
+def store_cached_analysis(project_id, content_hash, parsed_data):
+    """Queue the cache upsert; returns the bulk writer's future (None when disabled)."""
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+
+    now = datetime.now(timezone.utc)
+    increment("analysis_cache.stores")
+    return analysis_cache_writer.upsert(
+        _cache_key(project_id, content_hash),
+        {
+            "$set": {"parsed_data": parsed_data, "last_used_at": now},
+            "$setOnInsert": {"created_at": now, "hits": 0}
+        }
+    )
+
+
+def evict_analysis_cache(project_id):
+    if not ANALYSIS_CACHE_ENABLED:
+        return
+
+    project_filter = {"project_id": ObjectId(project_id)}
+    overflow = analysis_cache_collection.count_documents(project_filter) - ANALYSIS_CACHE_MAX_ENTRIES
+    if overflow <= 0:
+        return
+
+    stale_ids = [
+        doc["_id"]
+        for doc in analysis_cache_collection.find(project_filter, {"_id": 1})
+        .sort("last_used_at", 1)
+        .limit(overflow)
+    ]
+    result = analysis_cache_collection.delete_many({"_id": {"$in": stale_ids}})
+    increment("analysis_cache.evictions", result.deleted_count)
+    print(f"[AnalysisCache] Evicted {result.deleted_count} entries for project_id={project_id}")
@@ -0,0 +1,99 @@
+# services/chunk_packer.py
+
+import os
+
+# Requests to call_gpt_analyze_chunk are packed up to this many estimated
+# tokens of code, so a large group never overflows the context/output window
+# and several small groups can share one round trip.
+ANALYSIS_TOKEN_BUDGET = int(os.getenv("ANALYSIS_TOKEN_BUDGET", 12000))
+
+# A request whose output is cut off at max_tokens is split in half and retried,
+# at most this many times over; what is still truncated then counts as failed.
+ANALYSIS_MAX_SPLITS = int(os.getenv("ANALYSIS_MAX_SPLITS", 3))
+
+# Rough local estimate (no tokenizer dependency): ~4 characters per token for
+# source code, plus the per-chunk framing added by call_gpt_analyze_chunk.
+CHARS_PER_TOKEN = 4
+CHUNK_OVERHEAD_TOKENS = 20
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_chunk_tokens(chunk):
+    file_name, chunk_lines = chunk
+    return estimate_tokens(file_name) + sum(estimate_tokens(line) for line in chunk_lines) + CHUNK_OVERHEAD_TOKENS
+
+
+def estimate_file_tokens(path):
+    try:
+        return os.path.getsize(path) // CHARS_PER_TOKEN + CHUNK_OVERHEAD_TOKENS
+    except OSError:
+        return CHUNK_OVERHEAD_TOKENS
+
+
+def split_chunk(chunk, budget):
+    """Halve a chunk by lines until every piece fits the budget."""
+    file_name, chunk_lines = chunk
+    if estimate_chunk_tokens(chunk) <= budget or len(chunk_lines) <= 1:
+        return [chunk]
+
+    middle = len(chunk_lines) // 2
+    return split_chunk((file_name, chunk_lines[:middle]), budget) + split_chunk((file_name, chunk_lines[middle:]), budget)
+
+
+def split_request(request):
+    """Halve a packed request: by chunks, or a lone chunk by lines. None if it can't be split."""
+    if len(request) > 1:
+        middle = len(request) // 2
+        return [request[:middle], request[middle:]]
+
+    file_name, chunk_lines = request[0]
+    if len(chunk_lines) <= 1:
+        return None
+    middle = len(chunk_lines) // 2
+    return [[(file_name, chunk_lines[:middle])], [(file_name, chunk_lines[middle:])]]
+
+
+def pack_chunks(file_chunks, budget=ANALYSIS_TOKEN_BUDGET):
+    """Pack (file_name, chunk_lines) tuples into requests of at most `budget` tokens.
+
+    Chunks are kept in order so a file's consecutive chunks tend to share a
+    request.
+    """
+    requests = []
+    current, current_tokens = [], 0
+
+    for chunk in file_chunks:
+        for piece in split_chunk(chunk, budget):
+            tokens = estimate_chunk_tokens(piece)
+            if current and current_tokens + tokens > budget:
+                requests.append(current)
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+
+    if current:
+        requests.append(current)
+    return requests
+
+
+def merge_small_groups(groups, budget=ANALYSIS_TOKEN_BUDGET):
+    """Merge consecutive groups whose files together still fit one request."""
+    merged = []
+    current, current_tokens = [], 0
+
+    for group in groups:
+        if not group:
+            continue
+        tokens = sum(estimate_file_tokens(path) for path in group)
+        if current and current_tokens + tokens > budget:
+            merged.append(current)
+            current, current_tokens = [], 0
+        current = current + list(group)
+        current_tokens += tokens
+
+    if current:
+        merged.append(current)
+    return merged
@@ -1,13 +1,58 @@
-import openai
 import os
-import asyncio
+from functools import partial
 from dotenv import load_dotenv
+from services.llm_scheduler import estimate_messages_tokens
+from services.llm_resilience import call_llm
+from services.llm_backends import get_llm_backend
+from services.json_stream import ArrayItemStreamParser
 import json
 load_dotenv()
 
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Bump ANALYSIS_PROMPT_VERSION whenever the analysis or sanity prompts change,
+# so cached per-file results from the old prompts are no longer reused.
+ANALYSIS_MODEL = "gpt-4o"
+ANALYSIS_PROMPT_VERSION = "3"
 
-async def call_gpt_analyze_chunk(file_chunks):
+# Stream analysis completions and hand each bug to the caller as soon as its
+# JSON object closes, instead of waiting for the whole response.
+ANALYSIS_STREAMING = os.getenv("ANALYSIS_STREAMING", "true").lower() == "true"
+
+SANITY_BATCH_MAX_OUTPUT_TOKENS = int(os.getenv("SANITY_BATCH_MAX_OUTPUT_TOKENS", 4096))
+
+
+def once_per_bug(on_bug):
+    """Wrap an on_bug callback so a bug seen again (a retried or re-split stream) is not re-sent."""
+    seen = set()
+
+    async def emit(bug):
+        key = json.dumps(bug, sort_keys=True, default=str)
+        if key in seen:
+            return
+        seen.add(key)
+        await on_bug(bug)
+
+    return emit
+
+
+async def stream_completion(messages, max_tokens, on_bug):
+    parser = ArrayItemStreamParser("bugs")
+    content_parts = []
+    finish_reason = None
+
+    async for delta, chunk_finish_reason in get_llm_backend().stream(ANALYSIS_MODEL, messages, max_tokens):
+        finish_reason = chunk_finish_reason or finish_reason
+        content_parts.append(delta)
+        for bug in parser.feed(delta):
+            await on_bug(bug)
+
+    return "".join(content_parts), finish_reason
+
+
+async def call_gpt_analyze_chunk(file_chunks, on_bug=None, hints=""):
+    """Analyze one packed request; returns (content, finish_reason).
+
+    finish_reason "length" means the output was cut off at max_tokens.
+    """
     chunk_message_parts = []
 
     for file_name, chunk_lines in file_chunks:
@@ -16,6 +61,7 @@ async def call_gpt_analyze_chunk(file_chunks):
         chunk_message_parts.append(part)
 
     chunk_message = "".join(chunk_message_parts).replace("{", "{{").replace("}", "}}")
+    hints_message = f"\n{hints}\n" if hints else ""
 
     messages = [
         {
@@ -29,24 +75,26 @@ You are analyzing the following files from a software project.
 Each file is divided into clearly labeled chunks.
 
 For each BUG:
+- File: the Filename of the file it is in, exactly as given
 - Line number (approximate is fine)
 - Priority: High / Medium / Low
 - Confidence: High / Medium / Low
 - Description
 
 For each OPTIMIZATION:
+- File: the Filename of the file it applies to, exactly as given
 - Line number (or 0 / -1 if not applicable)
 - Description
 
 ⚠️ Return ONLY valid JSON:
 {{
-  "bugs": [{{"line": ..., "priority": "...", "confidence": "...", "description": "..."}}],
-  "optimizations": [{{"line": ..., "description": "..."}}]
+  "bugs": [{{"file": "...", "line": ..., "priority": "...", "confidence": "...", "description": "..."}}],
+  "optimizations": [{{"file": "...", "line": ..., "description": "..."}}]
 }}
 
 If no bugs/optimizations:
 {{"bugs": [], "optimizations": []}}
-
+{hints_message}
 Now here are the files:
 
 {chunk_message}
@@ -54,20 +102,27 @@ Now here are the files:
         }
     ]
 
-    response = await asyncio.to_thread(
-        client.chat.completions.create,
-        model="gpt-4o",
-        messages=messages,
-        max_tokens=4096,
-        temperature=0
-    )
-
-    content = response.choices[0].message.content
+    if on_bug is not None and ANALYSIS_STREAMING:
+        content, finish_reason = await call_llm(
+            partial(stream_completion, messages, 4096, once_per_bug(on_bug)),
+            estimate_messages_tokens(messages) + 4096,
+            label="analysis",
+            hedge=False
+        )
+    else:
+        content, finish_reason = await call_llm(
+            partial(get_llm_backend().complete, ANALYSIS_MODEL, messages, 4096),
+            estimate_messages_tokens(messages) + 4096,
+            label="analysis"
+        )
+
+    if finish_reason == "length":
+        print(f"[WARNING] GPT analysis output truncated at max_tokens ({len(file_chunks)} chunks) — lower ANALYSIS_TOKEN_BUDGET")
     print("\n===== GPT Analyze Chunk Output =====")
     print(content)
     print("====================================\n")
 
-    return content
+    return content, finish_reason
 
 
 
@@ -86,12 +141,13 @@ Your task:
 - FIX incorrect line numbers if needed.
 - DO NOT include cosmetic or style-only issues.
 - DO NOT erase valid bugs unless clearly wrong.
+- KEEP the "file" of every bug; give added bugs the file they are in.
 
 You MUST return a clean JSON object in the following format:
 
 {
   "bugs": [
-    { "line": ..., "priority": "...", "confidence": "...", "description": "..." }
+    { "file": "...", "line": ..., "priority": "...", "confidence": "...", "description": "..." }
   ]
 }
 
@@ -118,16 +174,12 @@ Please return the corrected list, as valid JSON only.
         }
     ]
 
-    response = await asyncio.to_thread(
-        client.chat.completions.create,
-        model="gpt-4o",
-        messages=messages,
-        max_tokens=2048,
-        temperature=0
+    content, _ = await call_llm(
+        partial(get_llm_backend().complete, ANALYSIS_MODEL, messages, 2048),
+        estimate_messages_tokens(messages) + 2048,
+        label="sanity_check"
     )
 
-    content = response.choices[0].message.content
-
 
     if content.strip().startswith("```json"):
         content = content.strip().split("```json")[1].split("```")[0].strip()
@@ -142,6 +194,75 @@ Please return the corrected list, as valid JSON only.
 
 
 
+async def run_batched_sanity_check(review_items):
+    """Review the bug lists of several groups in one request.
+
+    review_items maps an item key to {"files": [...], "bugs": [...]}; the
+    response maps the same keys to their corrected bug lists.
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": """
+You are a professional code reviewer.
+
+You will receive several REVIEW ITEMS as one JSON object. Each item has a key,
+the files it covers and a list of BUGS detected in those files.
+
+For EACH item independently:
+- REMOVE false positives.
+- ADD missing critical bugs if any.
+- FIX incorrect line numbers if needed.
+- DO NOT include cosmetic or style-only issues.
+- DO NOT erase valid bugs unless clearly wrong.
+- KEEP the "file" of every bug; give added bugs the file they are in.
+
+You MUST return a clean JSON object with one entry per item key:
+
+{
+  "results": {
+    "<item key>": {
+      "bugs": [
+        { "file": "...", "line": ..., "priority": "...", "confidence": "...", "description": "..." }
+      ]
+    }
+  }
+}
+
+Every item key from the input must appear in "results"; use "bugs": [] when none remain.
+
+Do NOT return any explanation or extra text. Only return the clean JSON.
+"""
+        },
+        {
+            "role": "user",
+            "content": f"""
+Here are the review items (JSON format):
+
+{json.dumps(review_items, indent=2)}
+
+Please return the corrected lists, as valid JSON only.
+"""
+        }
+    ]
+
+    content, _ = await call_llm(
+        partial(get_llm_backend().complete, ANALYSIS_MODEL, messages, SANITY_BATCH_MAX_OUTPUT_TOKENS),
+        estimate_messages_tokens(messages) + SANITY_BATCH_MAX_OUTPUT_TOKENS,
+        label="sanity_check_batch"
+    )
+
+    if content.strip().startswith("```json"):
+        content = content.strip().split("```json")[1].split("```")[0].strip()
+    elif content.strip().startswith("```"):
+        content = content.strip().split("```")[1].split("```")[0].strip()
+
+    print(f"\n===== GPT Batched Sanity Check Output ({len(review_items)} items) =====")
+    print(content)
+    print("==================================\n")
+
+    return content
+
 
 async def call_gpt_async(code_chunk, file_path):
     code_chunk_safe = code_chunk.replace("{", "{{").replace("}", "}}")
@@ -172,15 +293,11 @@ Here is the file content:
         }
     ]
 
-    response = await asyncio.to_thread(
-        client.chat.completions.create,
-        model="gpt-4o",
-        messages=messages,
-        max_tokens=4096,
-        temperature=0
+    content, _ = await call_llm(
+        partial(get_llm_backend().complete, ANALYSIS_MODEL, messages, 4096),
+        estimate_messages_tokens(messages) + 4096,
+        label="single_file"
     )
-
-    content = response.choices[0].message.content
     print("\n===== GPT Single File Analyze Output =====")
     print(content)
     print("=========================================")
@@ -0,0 +1,157 @@
+# services/import_graph.py
+
+import ast
+import os
+import re
+from collections import defaultdict, deque
+from utils.file_manifest import read_lines
+
+# Local alternative to get_project_summary: group files by the imports they
+# actually make instead of asking GPT. Returns the same (dependencies,
+# connected_groups) shape as parse_project_summary, keyed by display_name.
+LOCAL_GROUP_MAX_FILES = int(os.getenv("LOCAL_GROUP_MAX_FILES", 8))
+
+PY_EXTENSIONS = (".py",)
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+
+JS_IMPORT_RE = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)['"]([^'"]+)['"]"""
+)
+
+
+def python_imports(source):
+    """Yield (level, module, names) for every import statement in the source."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield 0, alias.name, []
+        elif isinstance(node, ast.ImportFrom):
+            yield node.level, node.module or "", [alias.name for alias in node.names]
+
+
+def js_imports(source):
+    return JS_IMPORT_RE.findall(source)
+
+
+def _module_name(path):
+    module = path[:-3] if path.endswith(".py") else path
+    if module.endswith("/__init__"):
+        module = module[: -len("/__init__")]
+    return module.replace("/", ".")
+
+
+def _resolve_python(importer, level, module, names, modules_by_suffix):
+    if level:
+        base = importer.split("/")[:-level]
+        prefix = ".".join(base + ([module] if module else []))
+        candidates = [prefix] + [f"{prefix}.{name}" if prefix else name for name in names]
+    else:
+        candidates = [module] + [f"{module}.{name}" for name in names]
+
+    resolved = set()
+    for candidate in candidates:
+        if candidate:
+            resolved.update(modules_by_suffix.get(candidate, ()))
+    return resolved
+
+
+def _resolve_js(importer, specifier, known_paths):
+    if not specifier.startswith("."):
+        return set()
+
+    base = os.path.normpath(os.path.join(os.path.dirname(importer), specifier)).replace("\\", "/")
+    candidates = [base] + [base + ext for ext in JS_EXTENSIONS] + [f"{base}/index{ext}" for ext in JS_EXTENSIONS]
+    for candidate in candidates:
+        if candidate in known_paths:
+            return {candidate}
+    return set()
+
+
+def build_dependency_graph(file_previews):
+    """Map each display_name to the set of display_names it imports."""
+    known_paths = {f["display_name"] for f in file_previews}
+
+    # Every dotted suffix of a module points back at its file, so absolute
+    # imports resolve without knowing where the project root is.
+    modules_by_suffix = defaultdict(set)
+    for path in known_paths:
+        if path.endswith(PY_EXTENSIONS):
+            parts = _module_name(path).split(".")
+            for i in range(len(parts)):
+                modules_by_suffix[".".join(parts[i:])].add(path)
+
+    dependencies = {}
+    for file_obj in file_previews:
+        path = file_obj["display_name"]
+        source = "".join(read_lines(file_obj["filename"], file_obj))
+
+        edges = set()
+        if path.endswith(PY_EXTENSIONS):
+            for level, module, names in python_imports(source):
+                edges |= _resolve_python(path, level, module, names, modules_by_suffix)
+        elif path.endswith(JS_EXTENSIONS):
+            for specifier in js_imports(source):
+                edges |= _resolve_js(path, specifier, known_paths)
+
+        edges.discard(path)
+        dependencies[path] = sorted(edges)
+
+    return dependencies
+
+
+def _connected_components(paths, dependencies):
+    neighbours = defaultdict(set)
+    for path, deps in dependencies.items():
+        for dep in deps:
+            neighbours[path].add(dep)
+            neighbours[dep].add(path)
+
+    seen = set()
+    components = []
+    for start in sorted(paths, key=lambda p: (-len(neighbours[p]), p)):
+        if start in seen:
+            continue
+        # BFS from the best-connected file keeps closely related files adjacent
+        # when an oversized component is cut into slices below.
+        component = []
+        queue = deque([start])
+        seen.add(start)
+        while queue:
+            path = queue.popleft()
+            component.append(path)
+            for nxt in sorted(neighbours[path]):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+        components.append(component)
+
+    return components
+
+
+def group_files(file_previews, max_group_size=LOCAL_GROUP_MAX_FILES):
+    dependencies = build_dependency_graph(file_previews)
+    paths = [f["display_name"] for f in file_previews]
+
+    connected_groups = []
+    singletons_by_dir = defaultdict(list)
+    for component in _connected_components(paths, dependencies):
+        if len(component) == 1:
+            singletons_by_dir[os.path.dirname(component[0])].append(component[0])
+            continue
+        for i in range(0, len(component), max_group_size):
+            connected_groups.append(component[i:i + max_group_size])
+
+    # Files with no resolved imports are batched per directory rather than
+    # analysed one request each.
+    for directory in sorted(singletons_by_dir):
+        files = singletons_by_dir[directory]
+        for i in range(0, len(files), max_group_size):
+            connected_groups.append(files[i:i + max_group_size])
+
+    print(f"[ImportGraph] {len(paths)} files → {len(connected_groups)} groups")
+    return dependencies, connected_groups
@@ -0,0 +1,147 @@
+# services/job_queue.py
+
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from db.models import jobs_collection
+
+# A job is leased to one worker at a time. The owner must heartbeat before the
+# lease expires, otherwise any other worker may reclaim it and resume from the
+# groups recorded in completed_groups.
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 120))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# How often idle workers (and API processes in inline mode) look for queued
+# jobs, expired leases and jobs that ran out of attempts.
+JOB_SWEEP_SECONDS = float(os.getenv("JOB_SWEEP_SECONDS", 30))
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+
+def enqueue_job(upload_id, payload):
+    now = datetime.now(timezone.utc)
+    job = {
+        "upload_id": upload_id,
+        "status": "queued",
+        "payload": payload,
+        "completed_groups": [],
+        "attempts": 0,
+        "lease_owner": None,
+        "lease_expires_at": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+    job["_id"] = jobs_collection.insert_one(job).inserted_id
+    print(f"[JobQueue] Enqueued job for upload_id={upload_id}")
+    return job["_id"]
+
+
+def claim_job(worker_id=WORKER_ID, job_id=None):
+    now = datetime.now(timezone.utc)
+    query = {
+        "$or": [
+            {"status": "queued"},
+            {"status": "running", "lease_expires_at": {"$lt": now}}
+        ],
+        "attempts": {"$lt": JOB_MAX_ATTEMPTS}
+    }
+    if job_id is not None:
+        query["_id"] = job_id
+
+    return jobs_collection.find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": "running",
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def heartbeat_job(job_id, worker_id=WORKER_ID):
+    now = datetime.now(timezone.utc)
+    result = jobs_collection.update_one(
+        {"_id": job_id, "status": "running", "lease_owner": worker_id},
+        {"$set": {
+            "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+            "updated_at": now
+        }}
+    )
+    return result.matched_count == 1
+
+
+def checkpoint_group(job_id, group_index, worker_id=WORKER_ID):
+    """Record a finished group. Returns False if worker_id no longer holds the lease."""
+    result = jobs_collection.update_one(
+        {"_id": job_id, "status": "running", "lease_owner": worker_id},
+        {
+            "$addToSet": {"completed_groups": group_index},
+            "$set": {"updated_at": datetime.now(timezone.utc)}
+        }
+    )
+    return result.matched_count == 1
+
+
+def complete_job(job_id, worker_id=WORKER_ID, failed_groups=None):
+    jobs_collection.update_one(
+        {"_id": job_id, "lease_owner": worker_id},
+        {"$set": {
+            "status": "completed_with_errors" if failed_groups else "done",
+            "failed_groups": failed_groups or [],
+            "lease_expires_at": None,
+            "updated_at": datetime.now(timezone.utc)
+        }}
+    )
+
+
+def fail_job(job_id, error, worker_id=WORKER_ID):
+    """Release the lease after an error. Returns the job's new status."""
+    job = jobs_collection.find_one({"_id": job_id}, {"attempts": 1})
+    attempts = job.get("attempts", 0) if job else JOB_MAX_ATTEMPTS
+    status = "queued" if attempts < JOB_MAX_ATTEMPTS else "failed"
+
+    jobs_collection.update_one(
+        {"_id": job_id, "lease_owner": worker_id},
+        {"$set": {
+            "status": status,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "error": str(error),
+            "updated_at": datetime.now(timezone.utc)
+        }}
+    )
+    return status
+
+
+def fail_exhausted_jobs():
+    """Fail running jobs whose lease expired on their last attempt.
+
+    claim_job never matches them again, so without this they would stay
+    "running" forever. Returns the failed jobs (upload_id and extract_paths)
+    so the caller can remove their temp files.
+    """
+    failed = []
+    while True:
+        now = datetime.now(timezone.utc)
+        job = jobs_collection.find_one_and_update(
+            {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+            {"$set": {
+                "status": "failed",
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "error": "Lease expired on the last attempt",
+                "updated_at": now
+            }},
+            projection={"upload_id": 1, "payload.extract_paths": 1}
+        )
+        if job is None:
+            return failed
+        print(f"[JobQueue] Job for upload_id={job['upload_id']} failed: lease expired after {JOB_MAX_ATTEMPTS} attempts")
+        failed.append(job)
@@ -0,0 +1,69 @@
+# services/json_stream.py
+
+import json
+import re
+
+
+class ArrayItemStreamParser:
+    """Incrementally pull complete objects out of one JSON array in a text stream.
+
+    Feed it the completion text as it arrives; every call returns the objects
+    of the `key` array that closed since the previous call. Text before the
+    key (e.g. a ```json fence) and after the array is ignored.
+    """
+
+    def __init__(self, key="bugs"):
+        self.key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.object_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        items = []
+        if self.done:
+            return items
+
+        if not self.in_array:
+            match = self.key_pattern.search(self.buffer)
+            if not match:
+                return items
+            self.in_array = True
+            self.pos = match.end()
+
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if self.depth == 0 and ch == "{":
+                    self.object_start = self.pos
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 0:
+                    self.done = True
+                    break
+                self.depth -= 1
+                if self.depth == 0 and self.object_start is not None:
+                    try:
+                        items.append(json.loads(self.buffer[self.object_start:self.pos + 1]))
+                    except json.JSONDecodeError as e:
+                        print(f"[Stream Parse] Skipping malformed array item: {e}")
+                    self.object_start = None
+
+            self.pos += 1
+
+        return items
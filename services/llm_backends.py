@@ -0,0 +1,218 @@
+# services/llm_backends.py
+
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import json
+import os
+import random
+import re
+import time
+from services.llm_client import get_llm_client
+
+# LLM_BACKEND selects where completions come from:
+#   openai  - the real API (default)
+#   fake    - deterministic local responses with configurable latency/errors
+#   record  - call LLM_RECORD_INNER (default openai) and save every response
+#   replay  - answer only from responses saved by "record"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_RECORD_DIR = os.getenv("LLM_RECORD_DIR", "llm_recordings")
+LLM_RECORD_INNER = os.getenv("LLM_RECORD_INNER", "openai")
+LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "false").lower() == "true"
+
+FAKE_LLM_LATENCY_SECONDS = float(os.getenv("FAKE_LLM_LATENCY_SECONDS", 0.5))
+FAKE_LLM_LATENCY_JITTER = float(os.getenv("FAKE_LLM_LATENCY_JITTER", 0.5))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", 0))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", 42))
+
+STREAM_PIECE_CHARS = 16
+
+
+class LLMBackendError(Exception):
+    pass
+
+
+def prompt_hash(model, messages, max_tokens, temperature):
+    payload = json.dumps(
+        {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMBackend(ABC):
+    """A chat-completion source. complete() returns (content, finish_reason).
+
+    Subclasses must implement complete(); one that doesn't can't be created.
+    """
+
+    @abstractmethod
+    async def complete(self, model, messages, max_tokens, temperature=0):
+        ...
+
+    async def stream(self, model, messages, max_tokens, temperature=0):
+        """Yield (text_delta, finish_reason) pairs. Defaults to slicing complete()."""
+        content, finish_reason = await self.complete(model, messages, max_tokens, temperature)
+        for i in range(0, len(content), STREAM_PIECE_CHARS):
+            yield content[i:i + STREAM_PIECE_CHARS], None
+        yield "", finish_reason
+
+
+class OpenAIBackend(LLMBackend):
+    async def complete(self, model, messages, max_tokens, temperature=0):
+        response = await get_llm_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        return response.choices[0].message.content, response.choices[0].finish_reason
+
+    async def stream(self, model, messages, max_tokens, temperature=0):
+        stream = await get_llm_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        async for event in stream:
+            if not event.choices:
+                continue
+            choice = event.choices[0]
+            yield choice.delta.content or "", choice.finish_reason
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic offline stand-in for load and pipeline tests.
+
+    Responses depend only on the prompt, so repeated runs produce identical
+    results; latency and failures are drawn from a seeded RNG.
+    """
+
+    FILENAME_RE = re.compile(r"^Filename: (.+)$", re.MULTILINE)
+
+    def __init__(self, latency=FAKE_LLM_LATENCY_SECONDS, jitter=FAKE_LLM_LATENCY_JITTER, error_rate=FAKE_LLM_ERROR_RATE, seed=FAKE_LLM_SEED):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    async def complete(self, model, messages, max_tokens, temperature=0):
+        delay = max(0.0, self.rng.gauss(self.latency, self.jitter * self.latency))
+        await asyncio.sleep(delay)
+        if self.rng.random() < self.error_rate:
+            raise LLMBackendError("Fake LLM backend injected failure")
+
+        system_prompt = messages[0]["content"]
+        user_prompt = messages[-1]["content"]
+        if "software architect" in system_prompt:
+            return self._fake_summary(user_prompt), "stop"
+        if "REVIEW ITEMS" in system_prompt:
+            return self._fake_batch_review(user_prompt), "stop"
+        if "list of BUGS" in system_prompt:
+            return self._fake_review(user_prompt), "stop"
+        return self._fake_analysis(user_prompt), "stop"
+
+    def _fake_summary(self, prompt):
+        groups = {}
+        for filename in self.FILENAME_RE.findall(prompt):
+            groups.setdefault(os.path.dirname(filename.strip()), []).append(filename.strip())
+        return json.dumps(list(groups.values()))
+
+    def _fake_analysis(self, prompt):
+        bugs = []
+        for filename in dict.fromkeys(name.strip() for name in self.FILENAME_RE.findall(prompt)):
+            digest = int(hashlib.sha256(filename.encode("utf-8")).hexdigest(), 16)
+            bugs.append({
+                "file": filename,
+                "line": digest % 200 + 1,
+                "priority": ["High", "Medium", "Low"][digest % 3],
+                "confidence": ["High", "Medium", "Low"][(digest // 3) % 3],
+                "description": f"Fake finding for {os.path.basename(filename)}"
+            })
+        return json.dumps({"bugs": bugs, "optimizations": []})
+
+    def _fake_review(self, prompt):
+        match = re.search(r"(\[.*\])", prompt, re.DOTALL)
+        try:
+            bugs = json.loads(match.group(1)) if match else []
+        except json.JSONDecodeError:
+            bugs = []
+        return json.dumps({"bugs": bugs})
+
+    def _fake_batch_review(self, prompt):
+        match = re.search(r"(\{.*\})", prompt, re.DOTALL)
+        try:
+            items = json.loads(match.group(1)) if match else {}
+        except json.JSONDecodeError:
+            items = {}
+        return json.dumps({"results": {key: {"bugs": item.get("bugs", [])} for key, item in items.items()}})
+
+
+class RecordReplayBackend(LLMBackend):
+    """Persist prompt-hash → response pairs on disk, or answer from them."""
+
+    def __init__(self, directory=LLM_RECORD_DIR, inner=None, replay=False, replay_latency=LLM_REPLAY_LATENCY):
+        self.directory = directory
+        self.inner = inner
+        self.replay = replay
+        self.replay_latency = replay_latency
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    async def complete(self, model, messages, max_tokens, temperature=0):
+        key = prompt_hash(model, messages, max_tokens, temperature)
+        path = self._path(key)
+
+        if self.replay:
+            if not os.path.exists(path):
+                raise LLMBackendError(f"No recorded response for prompt {key}")
+            with open(path, "r", encoding="utf-8") as f:
+                recording = json.load(f)
+            if self.replay_latency:
+                await asyncio.sleep(recording.get("latency_seconds", 0))
+            return recording["content"], recording.get("finish_reason")
+
+        start = time.perf_counter()
+        content, finish_reason = await self.inner.complete(model, messages, max_tokens, temperature)
+        recording = {
+            "model": model,
+            "content": content,
+            "finish_reason": finish_reason,
+            "latency_seconds": time.perf_counter() - start
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(recording, f)
+        return content, finish_reason
+
+
+def create_backend(name):
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "fake":
+        return FakeBackend()
+    if name == "record":
+        return RecordReplayBackend(inner=create_backend(LLM_RECORD_INNER))
+    if name == "replay":
+        return RecordReplayBackend(replay=True)
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+
+_backend = None
+
+
+def get_llm_backend():
+    global _backend
+    if _backend is None:
+        _backend = create_backend(LLM_BACKEND)
+        print(f"[LLM] Using {type(_backend).__name__}")
+    return _backend
+
+
+def set_llm_backend(backend):
+    """Swap the process-wide backend (benchmarks, offline runs)."""
+    global _backend
+    _backend = backend
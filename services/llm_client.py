@@ -0,0 +1,46 @@
+# services/llm_client.py
+
+import os
+import httpx
+import openai
+from dotenv import load_dotenv
+load_dotenv()
+
+# One AsyncOpenAI client per process, shared by every service, so calls are
+# plain coroutines on a pooled keep-alive connection set instead of blocking
+# threads.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 20))
+LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", 30))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", 10))
+LLM_READ_TIMEOUT_SECONDS = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", 120))
+
+_client = None
+
+
+def get_llm_client():
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0,  # retries are handled by services/llm_resilience
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY_SECONDS
+                ),
+                timeout=httpx.Timeout(
+                    LLM_READ_TIMEOUT_SECONDS,
+                    connect=LLM_CONNECT_TIMEOUT_SECONDS
+                )
+            )
+        )
+    return _client
+
+
+async def close_llm_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
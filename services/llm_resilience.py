@@ -0,0 +1,113 @@
+# services/llm_resilience.py
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+import openai
+from services.llm_backends import LLMBackendError
+from services.llm_scheduler import llm_scheduler
+from utils.metrics import increment, observe
+
+# Every LLM call gets a per-attempt deadline, retries with full-jitter
+# exponential backoff for transient errors, and (optionally) a hedged
+# duplicate request once it has run longer than the recent p95 latency.
+LLM_CALL_TIMEOUT_SECONDS = float(os.getenv("LLM_CALL_TIMEOUT_SECONDS", 90))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 1))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 30))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LatencyTracker:
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        if len(self.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# One tracker per call label: a cheap sanity check must not wait for the p95
+# of large analysis calls before it is hedged.
+latency_trackers = {}
+
+
+def latency_tracker(label):
+    tracker = latency_trackers.get(label)
+    if tracker is None:
+        tracker = latency_trackers[label] = LatencyTracker()
+    return tracker
+
+
+def is_retryable(error):
+    if isinstance(error, (asyncio.TimeoutError, LLMBackendError, openai.APIConnectionError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+async def _run_with_deadline(make_call, label):
+    start = time.perf_counter()
+    result = await asyncio.wait_for(make_call(), timeout=LLM_CALL_TIMEOUT_SECONDS)
+    elapsed = time.perf_counter() - start
+    latency_tracker(label).record(elapsed)
+    observe(f"llm.{label}", elapsed)
+    return result
+
+
+async def _attempt(make_call, estimated_tokens, label, hedge):
+    def submit():
+        return asyncio.create_task(
+            llm_scheduler.submit(lambda: _run_with_deadline(make_call, label), estimated_tokens)
+        )
+
+    hedge_delay = latency_tracker(label).percentile(LLM_HEDGE_PERCENTILE) if hedge and LLM_HEDGE_ENABLED else None
+    pending = {submit()}
+
+    try:
+        if hedge_delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                increment("llm.hedged")
+                pending.add(submit())
+
+        last_error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call_llm(make_call, estimated_tokens, label="call", hedge=True):
+    """Run make_call() through the scheduler with deadline, retries and hedging.
+
+    Pass hedge=False for calls with side effects (e.g. streamed callbacks) that
+    must not run twice concurrently.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return await _attempt(make_call, estimated_tokens, label, hedge)
+        except Exception as e:
+            if not is_retryable(e) or attempt == LLM_MAX_RETRIES:
+                increment(f"llm.{label}.failed")
+                raise
+            delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+            increment(f"llm.{label}.retries")
+            print(f"[LLM] {label} attempt {attempt + 1} failed ({type(e).__name__}: {e}) — retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
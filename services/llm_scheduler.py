@@ -0,0 +1,195 @@
+# services/llm_scheduler.py
+
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from utils.metrics import increment, observe, set_gauge
+from services.chunk_packer import estimate_tokens
+
+# Every LLM call in the process goes through one scheduler. It keeps a FIFO
+# queue per upload and, whenever capacity frees up, serves the upload with the
+# least queued work first (shortest job first), so a small upload is never
+# stuck behind a 300-group one. Requests/tokens per minute are enforced over a
+# sliding 60s window, counting prompt estimate + max_tokens like OpenAI does.
+LLM_MAX_RPM = int(os.getenv("LLM_MAX_RPM", 500))
+LLM_MAX_TPM = int(os.getenv("LLM_MAX_TPM", 300000))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+LLM_ROLE_PRIORITY = os.getenv("LLM_ROLE_PRIORITY", "false").lower() == "true"
+
+ROLE_PRIORITY = {"team_lead": 0, "developer": 1}
+RATE_WINDOW_SECONDS = 60
+
+current_upload = contextvars.ContextVar("current_upload", default=None)
+
+
+def estimate_messages_tokens(messages):
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def set_upload_context(upload_id, role="developer"):
+    """Tag LLM calls made from the current task (and tasks it spawns) with an upload."""
+    current_upload.set({"upload_id": upload_id, "role": role})
+
+
+class LLMScheduler:
+    def __init__(self, max_rpm=LLM_MAX_RPM, max_tpm=LLM_MAX_TPM, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.max_rpm = max_rpm
+        self.max_tpm = max_tpm
+        self.max_concurrency = max_concurrency
+        self.queues = {}
+        self.queued_tokens = {}
+        self.roles = {}
+        self.last_served = {}
+        self.window = deque()
+        self.window_tokens = 0
+        self.active = 0
+        self.served = 0
+        self.wakeup = None
+        self.dispatcher = None
+
+    async def submit(self, make_call, estimated_tokens):
+        """Queue make_call() (a coroutine factory) and return its result once run."""
+        context = current_upload.get() or {}
+        upload_id = context.get("upload_id", "_system")
+        estimated_tokens = min(estimated_tokens, self.max_tpm)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (make_call, estimated_tokens, future, time.monotonic())
+        self.queues.setdefault(upload_id, deque()).append(entry)
+        self.queued_tokens[upload_id] = self.queued_tokens.get(upload_id, 0) + estimated_tokens
+        self.roles[upload_id] = context.get("role", "developer")
+        self._publish_gauges()
+
+        if self.wakeup is None:
+            self.wakeup = asyncio.Event()
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.create_task(self._dispatch())
+        self.wakeup.set()
+
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Give back the queued reservation now rather than when the
+            # dispatcher reaches the entry (it may be waiting on its tokens).
+            if self._remove(upload_id, entry):
+                increment("llm_scheduler.cancelled_queued")
+                self._publish_gauges()
+                self.wakeup.set()
+            raise
+
+    def stats(self):
+        return {
+            "queue_depth": sum(len(q) for q in self.queues.values()),
+            "queued_uploads": len(self.queues),
+            "active": self.active,
+            "window_requests": len(self.window),
+            "window_tokens": self.window_tokens,
+            "per_upload": {upload_id: len(q) for upload_id, q in self.queues.items()}
+        }
+
+    def _publish_gauges(self):
+        set_gauge("llm_scheduler.queue_depth", sum(len(q) for q in self.queues.values()))
+        set_gauge("llm_scheduler.queued_uploads", len(self.queues))
+        set_gauge("llm_scheduler.active", self.active)
+
+    def _next_upload(self):
+        def key(upload_id):
+            role_rank = ROLE_PRIORITY.get(self.roles.get(upload_id), 1) if LLM_ROLE_PRIORITY else 0
+            return (role_rank, self.queued_tokens[upload_id], self.last_served.get(upload_id, 0))
+        return min(self.queues, key=key)
+
+    def _remove(self, upload_id, entry):
+        """Drop a still-queued entry and its reserved tokens; False if it was already dispatched."""
+        queue = self.queues.get(upload_id)
+        if queue is None or not any(queued is entry for queued in queue):
+            return False
+        queue.remove(entry)
+        self.queued_tokens[upload_id] -= entry[1]
+        if not queue:
+            del self.queues[upload_id]
+            del self.queued_tokens[upload_id]
+            self.roles.pop(upload_id, None)
+            self.last_served.pop(upload_id, None)
+        return True
+
+    def _expire_window(self, now):
+        while self.window and now - self.window[0][0] >= RATE_WINDOW_SECONDS:
+            _, tokens = self.window.popleft()
+            self.window_tokens -= tokens
+
+    def _rate_delay(self, tokens, now):
+        """Seconds until a request of `tokens` fits both the RPM and TPM windows."""
+        self._expire_window(now)
+        if len(self.window) < self.max_rpm and self.window_tokens + tokens <= self.max_tpm:
+            return 0
+
+        freed_tokens = 0
+        for i, (started, entry_tokens) in enumerate(self.window):
+            freed_tokens += entry_tokens
+            if len(self.window) - (i + 1) < self.max_rpm and self.window_tokens - freed_tokens + tokens <= self.max_tpm:
+                return started + RATE_WINDOW_SECONDS - now
+        return RATE_WINDOW_SECONDS
+
+    async def _dispatch(self):
+        while True:
+            self.wakeup.clear()
+
+            if not self.queues:
+                await self.wakeup.wait()
+                continue
+            if self.active >= self.max_concurrency:
+                await self.wakeup.wait()
+                continue
+
+            upload_id = self._next_upload()
+            entry = self.queues[upload_id][0]
+            make_call, tokens, future, enqueued_at = entry
+
+            if future.done():
+                # Caller was cancelled while queued.
+                self._remove(upload_id, entry)
+                self._publish_gauges()
+                continue
+
+            delay = self._rate_delay(tokens, time.monotonic())
+            if delay > 0:
+                increment("llm_scheduler.rate_limited")
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._remove(upload_id, entry)
+
+            now = time.monotonic()
+            self.window.append((now, tokens))
+            self.window_tokens += tokens
+            self.served += 1
+            if upload_id in self.queues:
+                self.last_served[upload_id] = self.served
+            self.active += 1
+            observe("llm_scheduler.wait", now - enqueued_at)
+            self._publish_gauges()
+            run_task = asyncio.create_task(self._run(make_call, future))
+            # A caller that gives up (timeout, losing hedge) cancels the call itself.
+            future.add_done_callback(lambda f, task=run_task: task.cancel() if f.cancelled() else None)
+
+    async def _run(self, make_call, future):
+        try:
+            result = await make_call()
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            self.active -= 1
+            self._publish_gauges()
+            self.wakeup.set()
+
+
+llm_scheduler = LLMScheduler()
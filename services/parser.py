@@ -1,4 +1,5 @@
 import json
+from services.static_checks import repeats_static_finding
 
 def parse_outputs(analysis_output, sanity_checked_output=None):
     def clean_gpt_output(text):
@@ -44,3 +45,76 @@ def parse_outputs(analysis_output, sanity_checked_output=None):
         "analysis_output": analysis_output,
         "sanity_checked_output": sanity_checked_output if isinstance(sanity_checked_output, str) else json.dumps(sanity_checked_output)
     }
+
+
+def match_finding_file(reported_file, file_names):
+    """Map the "file" GPT reported for a finding onto one of the group's file names."""
+    if not reported_file:
+        return None
+
+    reported = str(reported_file).replace("\\", "/").strip()
+    if reported.startswith("./"):
+        reported = reported[2:]
+    for name in file_names:
+        if name == reported:
+            return name
+    for name in file_names:
+        if name.endswith("/" + reported) or reported.endswith("/" + name):
+            return name
+    return None
+
+
+def split_findings_by_file(findings, file_names):
+    """Group findings per file. Unattributable findings go to the first file."""
+    per_file = {name: [] for name in file_names}
+    unattributed = 0
+
+    for finding in findings:
+        name = match_finding_file(finding.get("file") if isinstance(finding, dict) else None, file_names)
+        if name is None:
+            name = file_names[0]
+            unattributed += 1
+        per_file[name].append(finding)
+
+    if unattributed:
+        print(f"[Parse Warning] {unattributed} finding(s) without a matching file — attached to {file_names[0]}")
+    return per_file
+
+
+def split_outputs_by_file(analysis_data, sanity_checked_data, file_names):
+    """Build one parse_outputs() result per file holding only that file's findings."""
+    sanity_checked_data = sanity_checked_data or {}
+    bugs = split_findings_by_file(analysis_data.get("bugs", []), file_names)
+    optimizations = split_findings_by_file(analysis_data.get("optimizations", []), file_names)
+    sanity_bugs = split_findings_by_file(sanity_checked_data.get("bugs", []), file_names)
+    sanity_optimizations = split_findings_by_file(sanity_checked_data.get("optimizations", []), file_names)
+
+    return {
+        name: parse_outputs(
+            {"bugs": bugs[name], "optimizations": optimizations[name]},
+            {"bugs": sanity_bugs[name], "optimizations": sanity_optimizations[name]}
+        )
+        for name in file_names
+    }
+
+
+def merge_static_results(parsed, static_result, llm_skipped=False):
+    """Add a file's static findings to its parse_outputs() result; they skip the sanity review.
+
+    GPT bugs that repeat a static finding are dropped, so nothing is stored or
+    counted twice.
+    """
+    if static_result is None:
+        return parsed
+
+    findings = static_result["findings"]
+    for key in ("bugs_original", "bugs_sanity_checked"):
+        parsed[key] = findings + [bug for bug in parsed[key] if not repeats_static_finding(bug, findings)]
+    parsed["static_analysis"] = {
+        "risk": static_result["risk"],
+        "complexity": static_result["complexity"],
+        "functions": static_result["functions"],
+        "trivial": static_result["trivial"],
+        "llm_skipped": llm_skipped
+    }
+    return parsed
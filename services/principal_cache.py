@@ -0,0 +1,50 @@
+# services/principal_cache.py
+
+import os
+import time
+from collections import OrderedDict
+from db import repository
+from utils.metrics import increment, set_gauge
+
+# User + project data behind a JWT subject, as GET /me returns it. Entries are
+# per process: PUT /me drops the caller's entry here, other API processes see
+# the change after at most PRINCIPAL_CACHE_TTL_SECONDS.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", 10000))
+
+_principals = OrderedDict()  # (user_id, project_id) -> (expires_at, principal)
+
+
+async def resolve_principal(user_id, project_id):
+    """Return {"username", "role", "project_name"}; raises LookupError naming what is missing."""
+    key = (user_id, project_id)
+    item = _principals.get(key)
+    if item is not None and item[0] > time.monotonic():
+        _principals.move_to_end(key)
+        increment("principal_cache.hits")
+        return item[1]
+    increment("principal_cache.misses")
+
+    user = await repository.find_user(user_id)
+    if not user:
+        raise LookupError("User")
+    project = await repository.find_project(project_id)
+    if not project:
+        raise LookupError("Project")
+
+    principal = {
+        "username": user["username"],
+        "role": user.get("role", "developer"),
+        "project_name": project["project_name"]
+    }
+    _principals[key] = (time.monotonic() + PRINCIPAL_CACHE_TTL_SECONDS, principal)
+    _principals.move_to_end(key)
+    while len(_principals) > PRINCIPAL_CACHE_MAX_ENTRIES:
+        _principals.popitem(last=False)
+    set_gauge("principal_cache.entries", len(_principals))
+    return principal
+
+
+def invalidate_principal(user_id):
+    for key in [key for key in _principals if key[0] == user_id]:
+        del _principals[key]
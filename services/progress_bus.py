@@ -0,0 +1,276 @@
+# services/progress_bus.py
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.errors import DuplicateKeyError
+from db.repository import async_db
+from utils.metrics import increment, set_gauge
+
+# Progress events for an upload are published to a bus and fanned out to every
+# WebSocket subscribed to that upload, whichever process it is connected to.
+# Each upload keeps its last PROGRESS_HISTORY_MAX_EVENTS events so a client
+# that connects late (e.g. after POST /upload/ returned) first receives the
+# history and then live events.
+#
+# PROGRESS_BUS_BACKEND:
+#   memory - in-process only; fine for a single API process with inline analysis
+#   mongo  - capped `progress_events` collection tailed once per process, plus
+#            per-upload history in `progress_history`; use it with
+#            `uvicorn --workers N` or ANALYSIS_EXECUTOR=worker
+PROGRESS_BUS_BACKEND = os.getenv("PROGRESS_BUS_BACKEND", "memory")
+PROGRESS_HISTORY_MAX_EVENTS = int(os.getenv("PROGRESS_HISTORY_MAX_EVENTS", 500))
+PROGRESS_HISTORY_MAX_UPLOADS = int(os.getenv("PROGRESS_HISTORY_MAX_UPLOADS", 1000))
+PROGRESS_HISTORY_TTL_SECONDS = float(os.getenv("PROGRESS_HISTORY_TTL_SECONDS", 3600))
+PROGRESS_TAIL_RETRY_SECONDS = float(os.getenv("PROGRESS_TAIL_RETRY_SECONDS", 0.5))
+PROGRESS_TAIL_OVERLAP_SECONDS = float(os.getenv("PROGRESS_TAIL_OVERLAP_SECONDS", 5))
+
+# Events waiting for one slow client. A progress-only event replaces a
+# progress-only event queued right before it; bugs and status messages are
+# always kept. A client that still falls this far behind is disconnected and
+# gets the history again when it reconnects.
+PROGRESS_CLIENT_QUEUE_SIZE = int(os.getenv("PROGRESS_CLIENT_QUEUE_SIZE", 256))
+
+
+def is_progress_only(payload):
+    """True for an intermediate percent update: a newer one makes it redundant.
+
+    Bugs, status messages without a percentage and the final (100%) message
+    never are.
+    """
+    progress = payload.get("progress")
+    return isinstance(progress, (int, float)) and progress < 100 and "bug" not in payload
+
+
+class ProgressSubscription:
+    """Bounded, coalescing queue of events for one client. put() never blocks."""
+
+    def __init__(self, max_pending=PROGRESS_CLIENT_QUEUE_SIZE, seen_window=2 * PROGRESS_HISTORY_MAX_EVENTS):
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+        self.paused = []  # events held back while history is being replayed
+        self.is_paused = False
+        self.seen = set()
+        self.seen_order = deque(maxlen=seen_window)
+
+    def put(self, event_id, payload, replay=False):
+        if self.is_paused:
+            self.paused.append((event_id, payload))
+            return
+        if event_id in self.seen:
+            return
+        if len(self.seen_order) == self.seen_order.maxlen:
+            self.seen.discard(self.seen_order[0])
+        self.seen_order.append(event_id)
+        self.seen.add(event_id)
+
+        if replay:
+            # History is delivered as recorded; its size is already bounded.
+            self.pending.append(payload)
+        elif self.pending and is_progress_only(payload) and is_progress_only(self.pending[-1]):
+            self.pending[-1] = payload
+            increment("progress_bus.coalesced")
+        elif len(self.pending) >= self.max_pending:
+            self.overflowed = True
+            increment("progress_bus.client_overflows")
+        else:
+            self.pending.append(payload)
+        self.ready.set()
+
+    def pause(self):
+        self.is_paused = True
+
+    def resume(self, history):
+        """Deliver history, then whatever arrived live while it was loading."""
+        self.is_paused = False
+        held, self.paused = self.paused, []
+        for event_id, payload in history:
+            self.put(event_id, payload, replay=True)
+        for event_id, payload in held:
+            self.put(event_id, payload)
+
+    async def get(self, timeout=None):
+        """Next payload, or None if nothing arrived within timeout seconds."""
+        while not self.pending:
+            self.ready.clear()
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.pending.popleft()
+
+
+class UploadLog:
+    def __init__(self, max_events):
+        self.history = deque(maxlen=max_events)
+        self.subscribers = set()
+        self.next_seq = 0
+        self.last_activity = time.monotonic()
+
+
+class InProcessBus:
+    def __init__(self, max_events=PROGRESS_HISTORY_MAX_EVENTS, max_uploads=PROGRESS_HISTORY_MAX_UPLOADS, ttl=PROGRESS_HISTORY_TTL_SECONDS):
+        self.max_events = max_events
+        self.max_uploads = max_uploads
+        self.ttl = ttl
+        self.logs = OrderedDict()
+
+    def _log(self, upload_id):
+        log = self.logs.get(upload_id)
+        if log is None:
+            log = self.logs[upload_id] = UploadLog(self.max_events)
+        log.last_activity = time.monotonic()
+        self.logs.move_to_end(upload_id)
+        return log
+
+    def _prune(self):
+        now = time.monotonic()
+        for upload_id, log in list(self.logs.items()):
+            expired = now - log.last_activity > self.ttl
+            if not (expired or len(self.logs) > self.max_uploads):
+                break
+            if not log.subscribers:
+                del self.logs[upload_id]
+        set_gauge("progress_bus.uploads", len(self.logs))
+
+    async def publish(self, upload_id, payload):
+        log = self._log(upload_id)
+        log.next_seq += 1
+        log.history.append((log.next_seq, payload))
+        for subscription in log.subscribers:
+            subscription.put(log.next_seq, payload)
+        self._prune()
+
+    async def subscribe(self, upload_id):
+        log = self._log(upload_id)
+        subscription = ProgressSubscription()
+        subscription.resume(log.history)
+        log.subscribers.add(subscription)
+        return subscription
+
+    async def unsubscribe(self, upload_id, subscription):
+        log = self.logs.get(upload_id)
+        if log is not None:
+            log.subscribers.discard(subscription)
+
+
+class MongoBus:
+    """Live events go through a capped collection shared by all processes.
+
+    Each process runs a single tailable cursor over all of progress_events and
+    fans each event out to its local subscribers of that upload. Replay
+    history is kept separately, one progress_history document per upload
+    holding its last max_events events, so a busy upload never pushes other
+    uploads' history out of the capped collection.
+    """
+
+    def __init__(self, max_events=PROGRESS_HISTORY_MAX_EVENTS):
+        self.collection = async_db["progress_events"]
+        self.history = async_db["progress_history"]
+        self.max_events = max_events
+        self.subscribers = {}
+        self.tailer = None
+
+    async def publish(self, upload_id, payload):
+        event_id = ObjectId()
+        now = datetime.now(timezone.utc)
+        await asyncio.gather(
+            self.collection.insert_one({
+                "_id": event_id,
+                "upload_id": upload_id,
+                "payload": payload,
+                "created_at": now
+            }),
+            self._record(upload_id, {"id": event_id, "payload": payload}, now)
+        )
+
+    async def _record(self, upload_id, event, now):
+        update = {
+            "$push": {"events": {"$each": [event], "$slice": -self.max_events}},
+            "$set": {"updated_at": now}
+        }
+        try:
+            await self.history.update_one({"upload_id": upload_id}, update, upsert=True)
+        except DuplicateKeyError:
+            # Another process created the document first; it exists now.
+            await self.history.update_one({"upload_id": upload_id}, update)
+
+    async def subscribe(self, upload_id):
+        subscription = ProgressSubscription()
+        subscription.pause()
+        self.subscribers.setdefault(upload_id, set()).add(subscription)
+        if self.tailer is None:
+            self.tailer = asyncio.create_task(self._tail())
+
+        try:
+            doc = await self.history.find_one({"upload_id": upload_id}, {"events": 1})
+        except Exception:
+            await self.unsubscribe(upload_id, subscription)
+            raise
+        events = doc.get("events", []) if doc else []
+        subscription.resume((event["id"], event["payload"]) for event in events)
+        return subscription
+
+    async def unsubscribe(self, upload_id, subscription):
+        subscribers = self.subscribers.get(upload_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self.subscribers[upload_id]
+        if not self.subscribers and self.tailer is not None:
+            self.tailer.cancel()
+            self.tailer = None
+
+    async def _tail(self):
+        overlap = timedelta(seconds=PROGRESS_TAIL_OVERLAP_SECONDS)
+        # Start a little in the past: subscribers drop the events they have
+        # already seen in their history.
+        start_id = ObjectId.from_datetime(datetime.now(timezone.utc) - overlap)
+        newest_id = None
+        while self.subscribers:
+            cursor = self.collection.find({"_id": {"$gt": start_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+            try:
+                async for doc in cursor:
+                    newest_id = doc["_id"] if newest_id is None else max(newest_id, doc["_id"])
+                    for subscription in list(self.subscribers.get(doc["upload_id"], ())):
+                        subscription.put(doc["_id"], doc["payload"])
+            except Exception as e:
+                print(f"[ProgressBus] Tail of progress_events failed: {e}")
+            finally:
+                await cursor.close()
+            # A tailable cursor dies when nothing matched yet; start a new one
+            # from the overlap before the newest event seen, since ids from
+            # different processes are not strictly ordered. The start never
+            # moves back, so an idle collection is not re-scanned further and
+            # further into the past.
+            await asyncio.sleep(PROGRESS_TAIL_RETRY_SECONDS)
+            if newest_id is not None:
+                start_id = max(start_id, ObjectId.from_datetime(newest_id.generation_time - overlap))
+
+
+def create_bus(name):
+    if name == "memory":
+        return InProcessBus()
+    if name == "mongo":
+        return MongoBus()
+    raise ValueError(f"Unknown PROGRESS_BUS_BACKEND: {name}")
+
+
+progress_bus = create_bus(PROGRESS_BUS_BACKEND)
+
+
+async def publish_progress(upload_id, payload):
+    increment("progress_bus.published")
+    try:
+        await progress_bus.publish(upload_id, payload)
+    except Exception as e:
+        # Progress is best effort; never fail an analysis over it.
+        increment("progress_bus.publish_errors")
+        print(f"[ProgressBus] Could not publish progress for upload_id={upload_id}: {e}")
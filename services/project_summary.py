@@ -1,14 +1,13 @@
 # services/project_summary.py
 
-import openai
-import os
-import asyncio
+from functools import partial
 import json
 from dotenv import load_dotenv
+from services.llm_scheduler import estimate_messages_tokens
+from services.llm_resilience import call_llm
+from services.llm_backends import get_llm_backend
 load_dotenv()
 
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 async def get_project_summary(file_previews):
     
     project_file_list = ""
@@ -45,16 +44,12 @@ Please generate the Connected Groups in the format described above.
 """}
     ]
 
-    response = await asyncio.to_thread(
-        client.chat.completions.create,
-        model="gpt-4o",
-        messages=messages,
-        max_tokens=4096,
-        temperature=0
+    content, _ = await call_llm(
+        partial(get_llm_backend().complete, "gpt-4o", messages, 4096),
+        estimate_messages_tokens(messages) + 4096,
+        label="project_summary"
     )
 
-    content = response.choices[0].message.content
-
     print("\n===== GPT Project Summary Output =====")
     print(content)
     print("======================================\n")
@@ -0,0 +1,236 @@
+# services/response_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from db import repository
+from db.models import db, file_analysis_writer
+from utils.metrics import increment, set_gauge
+
+# Read-through cache for the analysis result endpoints, keyed by route, query
+# string and caller scope. Entries are dropped when a file_analysis write for
+# their upload_id lands (save_to_mongo / save_partial_bug go through
+# file_analysis_writer) or after RESPONSE_CACHE_TTL_SECONDS.
+#
+# RESPONSE_CACHE_BACKEND:
+#   memory - per-process LRU bounded by entries and bytes (default)
+#   mongo  - shared `response_cache` collection; use it when API processes and
+#            workers run separately, so a worker's writes invalidate every API
+#   off    - no caching (ETags are still sent)
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 300))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 2000))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Only results of uploads whose job reached one of these (or that have no job,
+# i.e. legacy uploads) are stored; while a job runs, its writes may come from
+# another process and never invalidate this one's entries.
+CACHEABLE_JOB_STATUSES = {"done", "completed_with_errors", "failed"}
+
+
+class CachedResponse:
+    def __init__(self, body, etag, headers=None):
+        self.body = body
+        self.etag = etag
+        self.headers = headers or {}
+
+
+def build_cached_response(payload, headers=None):
+    body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return CachedResponse(body, etag, headers)
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (upload_id, expires_at, CachedResponse)
+        self.by_upload = {}
+        self.size = 0
+
+    async def get(self, key):
+        item = self.entries.get(key)
+        if item is None:
+            return None
+        if item[1] < time.monotonic():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return item[2]
+
+    async def set(self, key, upload_id, entry):
+        if len(entry.body) > self.max_bytes // 4:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (upload_id, time.monotonic() + self.ttl, entry)
+        self.by_upload.setdefault(upload_id, set()).add(key)
+        self.size += len(entry.body)
+
+        while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            increment("response_cache.evictions")
+        set_gauge("response_cache.entries", len(self.entries))
+        set_gauge("response_cache.bytes", self.size)
+
+    async def invalidate(self, upload_id):
+        for key in list(self.by_upload.get(upload_id, ())):
+            self._remove(key)
+
+    def _remove(self, key):
+        upload_id, _, entry = self.entries.pop(key)
+        self.size -= len(entry.body)
+        keys = self.by_upload.get(upload_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_upload[upload_id]
+
+
+class MongoBackend:
+    """Shared cache in the `response_cache` collection (TTL index on expires_at)."""
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.collection = db["response_cache"]
+        self.ttl = ttl
+
+    async def get(self, key):
+        doc = await asyncio.to_thread(
+            self.collection.find_one,
+            {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}}
+        )
+        if doc is None:
+            return None
+        return CachedResponse(doc["body"], doc["etag"], doc.get("headers"))
+
+    async def set(self, key, upload_id, entry):
+        if len(entry.body) > RESPONSE_CACHE_MAX_BYTES // 4:
+            return
+        await asyncio.to_thread(
+            self.collection.replace_one,
+            {"_id": key},
+            {
+                "upload_id": upload_id,
+                "body": entry.body,
+                "etag": entry.etag,
+                "headers": entry.headers,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+            },
+            upsert=True
+        )
+
+    async def invalidate(self, upload_id):
+        await asyncio.to_thread(self.collection.delete_many, {"upload_id": upload_id})
+
+
+def create_backend(name):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "mongo":
+        return MongoBackend()
+    if name == "off":
+        return None
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {name}")
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.in_flight = {}
+        self.filling = {}   # upload_id -> number of fills in progress
+        self.stale = set()  # uploads invalidated while a fill was in progress
+
+    async def respond(self, request, upload_id, produce, scope=""):
+        """Serve produce()'s (payload, headers) through the cache with ETag/304 handling.
+
+        Concurrent misses for the same key share one produce() call.
+        """
+        if self.backend is None:
+            payload, headers = await produce()
+            return self._response(request, build_cached_response(payload, headers))
+
+        key = f"{scope}|{request.url.path}?{sorted(request.query_params.multi_items())}"
+        entry = await self.backend.get(key)
+        if entry is not None:
+            increment("response_cache.hits")
+        elif key in self.in_flight:
+            increment("response_cache.coalesced")
+            entry = await asyncio.shield(self.in_flight[key])
+        else:
+            increment("response_cache.misses")
+            entry = await self._fill(key, upload_id, produce)
+
+        return self._response(request, entry)
+
+    async def _fill(self, key, upload_id, produce):
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        self.filling[upload_id] = self.filling.get(upload_id, 0) + 1
+        try:
+            # Checked before produce(): a job that finishes meanwhile may have
+            # written results the payload misses.
+            job = await repository.get_job_status(upload_id)
+            finished = job is None or job.get("status") in CACHEABLE_JOB_STATUSES
+            payload, headers = await produce()
+            entry = build_cached_response(payload, headers)
+            if not finished:
+                increment("response_cache.skipped_unfinished")
+            # A write that landed while produce() ran may not be in payload.
+            elif upload_id not in self.stale:
+                await self.backend.set(key, upload_id, entry)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; don't warn if there are none
+            raise
+        finally:
+            del self.in_flight[key]
+            self.filling[upload_id] -= 1
+            if not self.filling[upload_id]:
+                del self.filling[upload_id]
+                self.stale.discard(upload_id)
+
+    async def invalidate(self, upload_id):
+        if upload_id in self.filling:
+            self.stale.add(upload_id)
+        if self.backend is not None:
+            await self.backend.invalidate(upload_id)
+        increment("response_cache.invalidations")
+
+    def invalidate_soon(self, upload_id):
+        """Schedule invalidate() from sync code running on the event loop."""
+        if upload_id in self.filling:
+            self.stale.add(upload_id)
+        asyncio.get_running_loop().create_task(self.invalidate(upload_id))
+
+    def _response(self, request, entry):
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if entry.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            increment("response_cache.not_modified")
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache(create_backend(RESPONSE_CACHE_BACKEND))
+
+
+def _invalidate_written_uploads(filter_docs):
+    for upload_id in {filter_doc["upload_id"] for filter_doc in filter_docs}:
+        response_cache.invalidate_soon(upload_id)
+
+
+file_analysis_writer.add_listener(_invalidate_written_uploads)
@@ -0,0 +1,173 @@
+# services/sanity_stage.py
+
+import asyncio
+import json
+import os
+import traceback
+from services.chunk_packer import estimate_tokens
+from services.gpt_analysis import run_sanity_check_on_bugs, run_batched_sanity_check
+from services.llm_scheduler import current_upload, set_upload_context
+from utils.metrics import increment
+
+# SANITY_POLICY:
+#   review_all            - every finding is reviewed (default)
+#   trust_high_confidence - findings the analysis marked High confidence are
+#                           kept as-is; only the rest are reviewed
+#   off                   - no sanity pass; findings are kept as-is
+SANITY_POLICY = os.getenv("SANITY_POLICY", "review_all")
+
+# Findings from several groups of an upload are collected for up to
+# SANITY_BATCH_WINDOW_SECONDS and reviewed together in one request of at most
+# SANITY_BATCH_TOKEN_BUDGET tokens.
+SANITY_BATCH_TOKEN_BUDGET = int(os.getenv("SANITY_BATCH_TOKEN_BUDGET", 6000))
+SANITY_BATCH_WINDOW_SECONDS = float(os.getenv("SANITY_BATCH_WINDOW_SECONDS", 2))
+
+
+def strip_json_fences(text):
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif text.startswith("```"):
+        text = text.split("```")[1].split("```")[0].strip()
+    return text
+
+
+class PendingBatch:
+    def __init__(self, role):
+        self.role = role
+        self.items = {}
+        self.tokens = 0
+        self.flush_timer = None
+
+
+class SanityBatcher:
+    """Batches the findings of one upload's groups into shared review requests.
+
+    Batches never mix uploads and run under their own upload's scheduler
+    context. A batch is sent once every group of the upload that is still
+    running has joined it (at once for a lone group), when it reaches the
+    token budget, or after the window.
+    """
+
+    def __init__(self, token_budget=SANITY_BATCH_TOKEN_BUDGET, window_seconds=SANITY_BATCH_WINDOW_SECONDS):
+        self.token_budget = token_budget
+        self.window_seconds = window_seconds
+        self.pending = {}  # upload_id -> PendingBatch
+        self.running = {}  # upload_id -> groups still being analysed
+        self.next_key = 0
+
+    def track_groups(self, upload_id, count):
+        """Declare count more groups of upload_id that may ask for a review."""
+        self.running[upload_id] = self.running.get(upload_id, 0) + count
+
+    def group_finished(self, upload_id):
+        if upload_id not in self.running:
+            return
+        self.running[upload_id] -= 1
+        if self.running[upload_id] <= 0:
+            del self.running[upload_id]
+        self._flush_if_complete(upload_id)
+
+    async def review(self, file_names, bugs):
+        """Return {"bugs": [...], "reviewed": bool} for one group's findings, applying SANITY_POLICY.
+
+        reviewed is False when the review request failed or skipped the item;
+        bugs are then the unreviewed findings.
+        """
+        if not bugs:
+            increment("sanity.skipped_empty")
+            return {"bugs": [], "reviewed": True}
+        if SANITY_POLICY == "off":
+            return {"bugs": bugs, "reviewed": True}
+
+        trusted = []
+        if SANITY_POLICY == "trust_high_confidence":
+            trusted = [bug for bug in bugs if str(bug.get("confidence", "")).lower() == "high"]
+            bugs = [bug for bug in bugs if str(bug.get("confidence", "")).lower() != "high"]
+            increment("sanity.bypassed_high_confidence", len(trusted))
+            if not bugs:
+                return {"bugs": trusted, "reviewed": True}
+
+        reviewed_bugs, reviewed = await self._enqueue(file_names, bugs)
+        return {"bugs": trusted + reviewed_bugs, "reviewed": reviewed}
+
+    async def _enqueue(self, file_names, bugs):
+        context = current_upload.get() or {}
+        upload_id = context.get("upload_id", "_system")
+        item = {"files": file_names, "bugs": bugs}
+        tokens = estimate_tokens(json.dumps(item))
+
+        batch = self.pending.get(upload_id)
+        if batch is not None and batch.tokens + tokens > self.token_budget:
+            self._flush(upload_id)
+            batch = None
+        if batch is None:
+            batch = self.pending[upload_id] = PendingBatch(context.get("role", "developer"))
+
+        self.next_key += 1
+        key = f"item_{self.next_key}"
+        future = asyncio.get_running_loop().create_future()
+        batch.items[key] = (item, future)
+        batch.tokens += tokens
+
+        if batch.tokens >= self.token_budget:
+            self._flush(upload_id)
+        elif not self._flush_if_complete(upload_id) and batch.flush_timer is None:
+            batch.flush_timer = asyncio.create_task(self._flush_later(upload_id, batch))
+
+        return await future
+
+    def _flush_if_complete(self, upload_id):
+        """Flush if no group of the upload that could still join is missing from its batch."""
+        batch = self.pending.get(upload_id)
+        if batch is None or len(batch.items) < self.running.get(upload_id, 1):
+            return False
+        self._flush(upload_id)
+        return True
+
+    async def _flush_later(self, upload_id, batch):
+        await asyncio.sleep(self.window_seconds)
+        batch.flush_timer = None
+        if self.pending.get(upload_id) is batch:
+            self._flush(upload_id)
+
+    def _flush(self, upload_id):
+        batch = self.pending.pop(upload_id, None)
+        if batch is None:
+            return
+        if batch.flush_timer is not None:
+            batch.flush_timer.cancel()
+            batch.flush_timer = None
+        asyncio.create_task(self._review_batch(upload_id, batch.role, batch.items))
+
+    async def _review_batch(self, upload_id, role, batch):
+        # The task inherited the context of whichever group flushed; the
+        # review belongs to the upload itself.
+        set_upload_context(upload_id, role)
+        increment("sanity.requests")
+        increment("sanity.items", len(batch))
+        try:
+            if len(batch) == 1:
+                (key, (item, _)), = batch.items()
+                content = await run_sanity_check_on_bugs(", ".join(item["files"]), json.dumps(item["bugs"], indent=2))
+                results = {key: json.loads(strip_json_fences(content))}
+            else:
+                content = await run_batched_sanity_check({key: item for key, (item, _) in batch.items()})
+                results = json.loads(strip_json_fences(content)).get("results", {})
+        except Exception as e:
+            traceback.print_exc()
+            print(f"[Sanity] Review of {len(batch)} item(s) failed — keeping unreviewed findings: {e}")
+            results = {}
+
+        for key, (item, future) in batch.items():
+            if future.done():
+                continue
+            result = results.get(key)
+            if isinstance(result, dict) and isinstance(result.get("bugs"), list):
+                future.set_result((result["bugs"], True))
+            else:
+                increment("sanity.unreviewed")
+                future.set_result((item["bugs"], False))
+
+
+sanity_batcher = SanityBatcher()
@@ -0,0 +1,427 @@
+# services/static_checks.py
+
+import ast
+import asyncio
+import bisect
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Deterministic pre-pass over each file before it goes to GPT:
+#   - cheap bug classes found with `ast` (Python) or a comment/string-aware
+#     scan (JS/TS); they are stored with the GPT findings ("source": "static")
+#     and listed in the prompt so GPT does not spend tokens repeating them
+#   - a complexity score, and the most complex functions as review hints
+#   - trivial files (constants, re-exports, empty __init__ stubs) skip GPT
+# Checks run in their own process pool so parsing never blocks the event loop.
+# Bump STATIC_CHECKS_VERSION when the rules change; it is part of the
+# analysis cache key.
+STATIC_CHECKS_ENABLED = os.getenv("STATIC_CHECKS_ENABLED", "true").lower() == "true"
+STATIC_SKIP_TRIVIAL = os.getenv("STATIC_SKIP_TRIVIAL", "true").lower() == "true"
+STATIC_CHECK_WORKERS = int(os.getenv("STATIC_CHECK_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+STATIC_HINT_MAX_FUNCTIONS = int(os.getenv("STATIC_HINT_MAX_FUNCTIONS", 3))
+STATIC_CHECKS_VERSION = "2"
+
+PY_EXTENSIONS = (".py",)
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs")
+
+PRIORITY_WEIGHTS = {"High": 10, "Medium": 4, "Low": 1}
+
+_static_pool = None
+
+
+def finding(file_name, line, priority, rule, description):
+    return {
+        "file": file_name,
+        "line": line,
+        "priority": priority,
+        "confidence": "High",
+        "description": description,
+        "source": "static",
+        "rule": rule
+    }
+
+
+# ---------------------------------------------------------------- Python
+
+PY_BRANCH_NODES = (
+    ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.ExceptHandler,
+    ast.With, ast.AsyncWith, ast.IfExp, ast.comprehension, ast.Assert, ast.match_case
+)
+PY_TRIVIAL_VALUES = (ast.Constant, ast.Name, ast.Attribute, ast.Tuple, ast.List, ast.Set, ast.Dict, ast.UnaryOp, ast.unaryop)
+MUTABLE_DEFAULTS = (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.DictComp, ast.SetComp)
+
+
+def _is_literal(node):
+    if isinstance(node, ast.Constant):
+        return node.value not in (None, True, False, Ellipsis)
+    return isinstance(node, (ast.List, ast.Dict, ast.Set, ast.Tuple, ast.JoinedStr))
+
+
+def _is_trivial_python(tree):
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.Pass)):
+            continue
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            continue
+        if isinstance(node, (ast.Assign, ast.AnnAssign)) and (node.value is None or isinstance(node.value, PY_TRIVIAL_VALUES)):
+            if all(isinstance(sub, PY_TRIVIAL_VALUES + (ast.expr_context,)) for sub in ast.walk(node.value or node.target)):
+                continue
+        return False
+    return True
+
+
+def _complexity(node):
+    """Cyclomatic-style score: 1 + branches and boolean operands, nested functions excluded."""
+    score = 1
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        if isinstance(child, PY_BRANCH_NODES):
+            score += 1
+        elif isinstance(child, ast.BoolOp):
+            score += len(child.values) - 1
+        stack.extend(ast.iter_child_nodes(child))
+    return score
+
+
+def _finally_exits(node, in_loop=False):
+    """Yield return (and loop-escaping break/continue) statements under a finally block."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+        return
+    if isinstance(node, ast.Return) or (not in_loop and isinstance(node, (ast.Break, ast.Continue))):
+        yield node
+        return
+    if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+        for child in node.body:
+            yield from _finally_exits(child, True)
+        for child in node.orelse:
+            yield from _finally_exits(child, in_loop)
+        return
+    for child in ast.iter_child_nodes(node):
+        yield from _finally_exits(child, in_loop)
+
+
+def check_python(file_name, source):
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError) as e:
+        line = getattr(e, "lineno", None) or 1
+        return {
+            "findings": [finding(file_name, line, "High", "py-syntax-error", f"File does not parse: {getattr(e, 'msg', e)}.")],
+            "complexity": 0,
+            "functions": [],
+            "trivial": False
+        }
+
+    findings = []
+    functions = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append({"name": node.name, "line": node.lineno, "complexity": _complexity(node)})
+            defaults = node.args.defaults + [d for d in node.args.kw_defaults if d is not None]
+            for default in defaults:
+                if isinstance(default, MUTABLE_DEFAULTS) or (
+                    isinstance(default, ast.Call) and isinstance(default.func, ast.Name) and default.func.id in ("list", "dict", "set")
+                ):
+                    findings.append(finding(
+                        file_name, default.lineno, "Medium", "py-mutable-default",
+                        f"Mutable default argument in `{node.name}()` is shared between calls."
+                    ))
+
+        elif isinstance(node, ast.ExceptHandler):
+            if node.type is None:
+                findings.append(finding(
+                    file_name, node.lineno, "Low", "py-bare-except",
+                    "Bare `except:` also catches KeyboardInterrupt and SystemExit."
+                ))
+            if len(node.body) == 1 and isinstance(node.body[0], ast.Pass):
+                findings.append(finding(
+                    file_name, node.lineno, "Low", "py-except-pass",
+                    "Exception is silently ignored (`except ...: pass`)."
+                ))
+
+        elif isinstance(node, ast.Compare):
+            for op, right in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.Is, ast.IsNot)) and (_is_literal(right) or _is_literal(node.left)):
+                    findings.append(finding(
+                        file_name, node.lineno, "Medium", "py-is-literal",
+                        "`is` compares identity, not value; use `==` / `!=` with literals."
+                    ))
+                    break
+
+        elif isinstance(node, ast.Assert):
+            if isinstance(node.test, ast.Tuple) and node.test.elts:
+                findings.append(finding(
+                    file_name, node.lineno, "High", "py-assert-tuple",
+                    "assert on a non-empty tuple is always true; the message belongs after a comma, outside the parentheses."
+                ))
+
+        elif isinstance(node, ast.Try) and node.finalbody:
+            for statement in node.finalbody:
+                for exit_node in _finally_exits(statement):
+                    findings.append(finding(
+                        file_name, exit_node.lineno, "Medium", "py-exit-in-finally",
+                        f"`{type(exit_node).__name__.lower()}` inside `finally` discards any exception raised in the `try` block."
+                    ))
+
+        elif isinstance(node, ast.Dict):
+            seen = set()
+            for key in node.keys:
+                if isinstance(key, ast.Constant):
+                    if key.value in seen:
+                        findings.append(finding(
+                            file_name, key.lineno, "Medium", "py-duplicate-key",
+                            f"Duplicate key {key.value!r} in dict literal; the earlier value is lost."
+                        ))
+                    seen.add(key.value)
+
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ("eval", "exec"):
+            findings.append(finding(
+                file_name, node.lineno, "Medium", "py-eval",
+                f"`{node.func.id}()` runs arbitrary code; make sure its input is trusted."
+            ))
+
+    module_complexity = _complexity(tree)
+    return {
+        "findings": findings,
+        "complexity": module_complexity + sum(function["complexity"] for function in functions),
+        "functions": functions,
+        "trivial": _is_trivial_python(tree)
+    }
+
+
+# ---------------------------------------------------------------- JS / TS
+
+JS_FUNCTION_RE = re.compile(r"\bfunction\b\s*\*?\s*([\w$]*)|([\w$]+)\s*=\s*(?:async\s*)?\([^()]*\)\s*=>|^\s*(?:async\s+)?([\w$]+)\s*\([^()]*\)\s*\{", re.M)
+JS_KEYWORDS = {"if", "for", "while", "switch", "catch", "return", "function"}
+JS_BRANCH_RE = re.compile(r"\b(?:if|for|while|case|catch)\b|&&|\|\||\?\?|\?(?![.?])")
+JS_NON_TRIVIAL_RE = re.compile(r"\b(?:function|class|if|for|while|switch|try|new|await|return|yield)\b|=>|\(")
+# Runs on strip_js() output, where every string literal is blanked to "   ".
+JS_IMPORT_RE = re.compile(r'\b(?:import|export)\b[^;\n]*\bfrom\s*"[^"\n]*"|\bimport\s*"[^"\n]*"|\b(?:require|import)\s*\(\s*"[^"\n]*"\s*\)')
+JS_CHECKS = [
+    ("js-eval", "Medium", re.compile(r"\beval\s*\(|\bnew\s+Function\s*\("), "`eval` / `new Function` runs arbitrary code; make sure its input is trusted."),
+    ("js-debugger", "Medium", re.compile(r"\bdebugger\b"), "`debugger` statement left in code."),
+    ("js-empty-catch", "Low", re.compile(r"\bcatch\s*(?:\([^)]*\))?\s*\{\s*\}"), "Empty `catch` block silently ignores errors."),
+    ("js-assign-in-condition", "Medium", re.compile(r"\b(?:if|while)\s*\(\s*[\w$.\[\]]+\s*=(?![=>])"), "Assignment used as a condition; did you mean `===`?"),
+    ("js-loose-equality", "Low", re.compile(r"(?<![=!<>])[=!]=(?!=)(?!\s*(?:null|undefined)\b)"), "Loose equality (`==` / `!=`) coerces types; use `===` / `!==`."),
+]
+
+
+def strip_js(source):
+    """Blank out comments and string/template/regex contents, keeping offsets and newlines."""
+    out = []
+    i, n = 0, len(source)
+    last_significant = ""
+    while i < n:
+        ch = source[i]
+        nxt = source[i + 1] if i + 1 < n else ""
+        if ch == "/" and nxt == "/":
+            end = source.find("\n", i)
+            end = n if end == -1 else end
+            out.append(" " * (end - i))
+            i = end
+        elif ch == "/" and nxt == "*":
+            end = source.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            out.append("".join(c if c == "\n" else " " for c in source[i:end]))
+            i = end
+        elif ch in "'\"`" or (ch == "/" and last_significant in "(,=:[!&|?{};"):
+            quote = ch
+            j = i + 1
+            while j < n and source[j] != quote:
+                if source[j] == "\\":
+                    j += 1
+                elif source[j] == "\n" and quote != "`":
+                    break
+                j += 1
+            body = source[i + 1:min(j, n)]
+            out.append('"' + "".join(c if c == "\n" else " " for c in body) + ('"' if j < n else ""))
+            i = j + 1
+            last_significant = '"'
+        else:
+            out.append(ch)
+            if not ch.isspace():
+                last_significant = ch
+            i += 1
+    return "".join(out)
+
+
+def check_js(file_name, source):
+    code = strip_js(source)
+    line_starts = [0] + [match.end() for match in re.finditer("\n", code)]
+
+    def line_of(offset):
+        return bisect.bisect_right(line_starts, offset)
+
+    findings = []
+    for rule, priority, pattern, description in JS_CHECKS:
+        for match in pattern.finditer(code):
+            findings.append(finding(file_name, line_of(match.start()), priority, rule, description))
+
+    function_starts = []
+    for match in JS_FUNCTION_RE.finditer(code):
+        name = next((group for group in match.groups() if group), "<anonymous>")
+        if name not in JS_KEYWORDS:
+            function_starts.append((match, name))
+
+    functions = []
+    for index, (match, name) in enumerate(function_starts):
+        end = function_starts[index + 1][0].start() if index + 1 < len(function_starts) else len(code)
+        functions.append({
+            "name": name,
+            "line": line_of(match.start()),
+            "complexity": 1 + len(JS_BRANCH_RE.findall(code, match.end(), end))
+        })
+
+    return {
+        "findings": findings,
+        "complexity": 1 + len(JS_BRANCH_RE.findall(code)),
+        "functions": functions,
+        "trivial": not JS_NON_TRIVIAL_RE.search(JS_IMPORT_RE.sub("", code))
+    }
+
+
+# ---------------------------------------------------------------- entry points
+
+def check_source(file_name, source):
+    """Static result for one file: findings, complexity, risk, hint functions and trivial flag."""
+    lower = file_name.lower()
+    if lower.endswith(PY_EXTENSIONS):
+        result = check_python(file_name, source)
+    elif lower.endswith(JS_EXTENSIONS):
+        result = check_js(file_name, source)
+    else:
+        return None
+
+    if not source.strip():
+        result["trivial"] = True
+    unique = {}
+    for f in result["findings"]:
+        unique.setdefault((f["rule"], f["line"]), f)
+    result["findings"] = sorted(unique.values(), key=lambda f: f["line"])
+    result["risk"] = result["complexity"] + sum(PRIORITY_WEIGHTS.get(f["priority"], 1) for f in result["findings"])
+    result["functions"] = sorted(result["functions"], key=lambda f: -f["complexity"])[:STATIC_HINT_MAX_FUNCTIONS]
+    return result
+
+
+def check_sources(items):
+    """Pool entry point: [(file_name, source)] -> {file_name: result}."""
+    results = {}
+    for file_name, source in items:
+        try:
+            result = check_source(file_name, source)
+        except Exception as e:
+            print(f"[StaticChecks] {file_name} skipped: {type(e).__name__}: {e}")
+            continue
+        if result is not None:
+            results[file_name] = result
+    return results
+
+
+def _get_static_pool():
+    global _static_pool
+    if _static_pool is None:
+        _static_pool = ProcessPoolExecutor(
+            max_workers=STATIC_CHECK_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _static_pool
+
+
+async def run_static_checks(items):
+    """Check [(file_name, source)] in the static pool, spread over its workers."""
+    global _static_pool
+    if not STATIC_CHECKS_ENABLED or not items:
+        return {}
+
+    batch_count = min(len(items), STATIC_CHECK_WORKERS)
+    batches = [items[i::batch_count] for i in range(batch_count)]
+    loop = asyncio.get_running_loop()
+    try:
+        batch_results = await asyncio.gather(*(
+            loop.run_in_executor(_get_static_pool(), check_sources, batch) for batch in batches
+        ))
+    except BrokenProcessPool as e:
+        # A worker died; analyse without static results and start a fresh pool next time.
+        _static_pool = None
+        print(f"[StaticChecks] Pool failed: {e}")
+        return {}
+
+    results = {}
+    for batch_result in batch_results:
+        results.update(batch_result)
+    return results
+
+
+def static_hints(file_names, static_results):
+    """Prompt lines telling GPT what the static pass already reported and where to look hardest."""
+    reported = []
+    focus = []
+    for file_name in file_names:
+        result = static_results.get(file_name)
+        if result is None:
+            continue
+        for f in result["findings"]:
+            reported.append(f"- {file_name} line {f['line']}: {f['description']}")
+        for function in result["functions"]:
+            if function["complexity"] >= 5:
+                focus.append(f"- {file_name}: {function['name']} (line {function['line']}, complexity {function['complexity']})")
+
+    lines = []
+    if reported:
+        lines.append("Static analysis already reported these; do NOT report them again:")
+        lines.extend(reported)
+    if focus:
+        lines.append("Most complex functions; review them carefully:")
+        lines.extend(focus)
+    return "\n".join(lines)
+
+
+# How GPT tends to describe each rule's bug class, to spot it reporting a
+# static finding again despite the hint. Lines only have to be within
+# DUPLICATE_LINE_SLACK, since GPT's line numbers are approximate.
+RULE_PATTERNS = {
+    "py-syntax-error": re.compile(r"syntax|does not parse|parse error", re.I),
+    "py-mutable-default": re.compile(r"mutable default|default (?:argument|parameter|value)", re.I),
+    "py-bare-except": re.compile(r"bare\s*`?except|except\s*:|broad except|catch(?:es)? all exceptions|keyboardinterrupt", re.I),
+    "py-except-pass": re.compile(r"silent|swallow|ignor|except.*pass", re.I),
+    "py-is-literal": re.compile(r"\bis\b.*(?:literal|identity)|identity comparison|instead of `?==", re.I),
+    "py-assert-tuple": re.compile(r"assert.*(?:tuple|always true)", re.I),
+    "py-exit-in-finally": re.compile(r"finally", re.I),
+    "py-duplicate-key": re.compile(r"duplicate (?:dict(?:ionary)? )?key", re.I),
+    "py-eval": re.compile(r"\beval\b|\bexec\b|arbitrary code", re.I),
+    "js-eval": re.compile(r"\beval\b|new Function|arbitrary code", re.I),
+    "js-debugger": re.compile(r"debugger", re.I),
+    "js-empty-catch": re.compile(r"empty .*catch|catch.*empty|silent|swallow", re.I),
+    "js-assign-in-condition": re.compile(r"assignment.*condition|instead of (?:comparison|`?===?)", re.I),
+    "js-loose-equality": re.compile(r"loose equality|strict equality|coerc|`?===`?", re.I),
+}
+DUPLICATE_LINE_SLACK = 1
+
+
+def repeats_static_finding(bug, findings):
+    """True if a GPT bug reports the same rule at (about) the same line as a static finding of its file."""
+    try:
+        line = int(bug.get("line"))
+    except (TypeError, ValueError):
+        return False
+    description = str(bug.get("description", ""))
+    for f in findings:
+        if abs(f["line"] - line) > DUPLICATE_LINE_SLACK:
+            continue
+        pattern = RULE_PATTERNS.get(f["rule"])
+        if bug.get("rule") == f["rule"] or (pattern is not None and pattern.search(description)):
+            return True
+    return False
+
+
+def shutdown_static_pool():
+    global _static_pool
+    if _static_pool is not None:
+        _static_pool.shutdown(wait=False, cancel_futures=True)
+        _static_pool = None
@@ -0,0 +1,144 @@
+# tests/test_query_plans.py
+#
+# Runs the real repository functions, route handlers and job queue calls
+# against a seeded scratch database, records every query they send, and fails
+# if explain() shows a COLLSCAN for any of them. Skipped when no MongoDB server
+# is reachable on MONGO_URI.
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("motor.motor_asyncio")
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
+from starlette.requests import Request
+
+from db import repository
+from db.indexes import _SAMPLE_PROJECT, _SAMPLE_USER, apply_indexes, collection_scans, seed_sample_data
+from db.mongo_client import MONGO_DB_NAME, MONGO_URI
+from routes import file_bugs, project
+from services import analysis_cache, job_queue
+from services.response_cache import response_cache
+
+SCRATCH_DB = f"{MONGO_DB_NAME}_query_plan_test"
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+# Driver bookkeeping that explain() rejects or doesn't need.
+DRIVER_FIELDS = {"lsid", "txnNumber", "readConcern", "writeConcern"}
+
+PROJECT_ID = str(_SAMPLE_PROJECT)
+USER_ID = str(_SAMPLE_USER)
+USER_DATA = {"project_id": PROJECT_ID, "user_id": USER_ID}
+
+
+class CommandRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE and event.database_name == SCRATCH_DB:
+            self.commands.append({
+                key: value for key, value in event.command.items()
+                if not key.startswith("$") and key not in DRIVER_FIELDS
+            })
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def get_request(path):
+    return Request({"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b""})
+
+
+def sync(fn, *args, **kwargs):
+    async def call():
+        fn(*args, **kwargs)
+    return call
+
+
+SCENARIOS = {
+    "find_user": lambda: repository.find_user(USER_ID),
+    "find_user_for_login": lambda: repository.find_user_for_login("user0", PROJECT_ID, "developer"),
+    "username_taken": lambda: repository.username_taken("user0", PROJECT_ID, exclude_user_id=USER_ID),
+    "count_users_by_role": lambda: repository.count_users_by_role(PROJECT_ID),
+    "find_project": lambda: repository.find_project(PROJECT_ID),
+    "find_project_by_name": lambda: repository.find_project_by_name("project1"),
+    "merge_bug_lists": lambda: repository.merge_bug_lists(["u-1", "u-2"]),
+    "list_upload_summaries after": lambda: repository.list_upload_summaries(
+        {"project_id": _SAMPLE_PROJECT}, 50, (datetime.now(timezone.utc), "u-9")
+    ),
+    "carry_over_file_analysis": lambda: repository.carry_over_file_analysis("u-1", "u-new", [ObjectId()], USER_ID, "alice"),
+    "get_job_status": lambda: repository.get_job_status("u-1"),
+    "GET /project/dashboard": lambda: project.project_dashboard(limit=50, cursor=None, counts_only=False, user_data=USER_DATA),
+    "GET /project/my-uploads": lambda: project.my_uploads(limit=50, cursor=None, counts_only=False, user_data=USER_DATA),
+    "GET /upload/{upload_id}": lambda: project.upload_details(
+        "u-1", get_request("/upload/u-1"), fields=None, limit=100, cursor=None, format=None, user_data=USER_DATA
+    ),
+    "GET /file-bugs": lambda: file_bugs.get_file_bugs(get_request("/file-bugs"), upload_id="u-1", file="u-1/f5.py"),
+    "GET /file_bugs/{upload_id}": lambda: file_bugs.get_all_file_bugs(
+        "u-1", get_request("/file_bugs/u-1"), fields=None, limit=100, cursor=None, format=None
+    ),
+    "claim_job": sync(job_queue.claim_job, "query-plan-test"),
+    "heartbeat_job": sync(job_queue.heartbeat_job, ObjectId(), "query-plan-test"),
+    "checkpoint_group": sync(job_queue.checkpoint_group, ObjectId(), 0, "query-plan-test"),
+    "fail_exhausted_jobs": sync(job_queue.fail_exhausted_jobs),
+    "get_cached_analysis": sync(analysis_cache.get_cached_analysis, PROJECT_ID, "h-1"),
+    "evict_analysis_cache": sync(analysis_cache.evict_analysis_cache, PROJECT_ID),
+}
+
+
+@pytest.fixture(scope="module")
+def scratch():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.server_info()
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f"No MongoDB server reachable at {MONGO_URI}: {e}")
+
+    client.drop_database(SCRATCH_DB)
+    database = client[SCRATCH_DB]
+    seed_sample_data(database)
+    apply_indexes(database)
+    yield database
+    client.drop_database(SCRATCH_DB)
+    client.close()
+
+
+def record_commands(scenario, monkeypatch):
+    recorder = CommandRecorder()
+    sync_client = MongoClient(MONGO_URI, event_listeners=[recorder])
+    monkeypatch.setattr(job_queue, "jobs_collection", sync_client[SCRATCH_DB]["jobs"])
+    monkeypatch.setattr(analysis_cache, "analysis_cache_collection", sync_client[SCRATCH_DB]["analysis_cache"])
+    monkeypatch.setattr(response_cache, "backend", None)
+
+    async def run():
+        async_client = AsyncIOMotorClient(MONGO_URI, event_listeners=[recorder])
+        for name in ("users", "projects", "file_analysis", "jobs", "uploads"):
+            monkeypatch.setattr(repository, name, async_client[SCRATCH_DB][name])
+        try:
+            await scenario()
+        finally:
+            async_client.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        sync_client.close()
+    return recorder.commands
+
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+def test_queries_use_an_index(name, scratch, monkeypatch):
+    commands = record_commands(SCENARIOS[name], monkeypatch)
+    assert commands, f"{name} sent no queries"
+
+    for command in commands:
+        explain = scratch.command("explain", command, verbosity="queryPlanner")
+        assert not collection_scans(explain), f"{name} scans a collection: {command}"
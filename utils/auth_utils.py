@@ -1,12 +1,18 @@
 # utils/auth_utils.py
 
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
 from passlib.hash import bcrypt
+import asyncio
 import jwt
+import multiprocessing
 import os
+import time
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from utils.metrics import increment, observe, set_gauge
 load_dotenv()
 
 
@@ -14,12 +20,72 @@ JWT_SECRET = os.getenv("JWT_SECRET", "fallback_secret")
 JWT_ALGORITHM = "HS256"
 JWT_EXP_DELTA_MINUTES = 60 * 24  
 
+# bcrypt runs in its own process pool so a burst of logins can neither block
+# the event loop nor take the threads other routes use. Existing hashes keep
+# verifying after BCRYPT_ROUNDS changes and are re-hashed on the next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 256))
+
+password_hasher = bcrypt.using(rounds=BCRYPT_ROUNDS)
+_password_pool = None
+_password_pending = 0
+
 
 def hash_password(password: str) -> str:
-    return bcrypt.hash(password)
+    return password_hasher.hash(password)
 
 def verify_password(password: str, password_hash: str) -> bool:
-    return bcrypt.verify(password, password_hash)
+    return password_hasher.verify(password, password_hash)
+
+def password_needs_rehash(password_hash: str) -> bool:
+    return password_hasher.needs_update(password_hash)
+
+
+def _get_password_pool():
+    global _password_pool
+    if _password_pool is None:
+        # spawn: forking a process that already runs Mongo/HTTP client threads is unsafe.
+        _password_pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _password_pool
+
+
+async def _run_in_password_pool(func, *args):
+    global _password_pool, _password_pending
+    if _password_pending >= PASSWORD_HASH_MAX_PENDING:
+        increment("auth.password_rejected")
+        raise HTTPException(status_code=503, detail="Too many logins in progress. Try again shortly.", headers={"Retry-After": "1"})
+
+    _password_pending += 1
+    set_gauge("auth.password_pending", _password_pending)
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_password_pool(), func, *args)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next call.
+        _password_pool = None
+        raise
+    finally:
+        _password_pending -= 1
+        set_gauge("auth.password_pending", _password_pending)
+        observe("auth.password_seconds", time.perf_counter() - start)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_password_pool(hash_password, password)
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await _run_in_password_pool(verify_password, password, password_hash)
+
+
+def shutdown_password_pool():
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown(wait=False, cancel_futures=True)
+        _password_pool = None
 
 
 def create_jwt_token(user_id: str, project_id: str, username: str, role: str) -> str:
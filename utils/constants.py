@@ -1,3 +1,6 @@
+import os
+from dotenv import load_dotenv
+load_dotenv()
 
 JUNK_FOLDERS = {
     "node_modules",
@@ -17,3 +20,8 @@ JUNK_FOLDERS = {
 
 
 MAX_PATH_LENGTH = 240
+
+# Uploads are streamed to disk in fixed-size chunks; the ceiling applies to the
+# whole request (all files together) and is enforced while streaming.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 1024 * 1024 * 1024))
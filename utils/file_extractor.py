@@ -1,8 +1,12 @@
+import asyncio
 import zipfile
 import os
-from utils.constants import JUNK_FOLDERS, MAX_PATH_LENGTH
+from fastapi import HTTPException
+from utils.constants import JUNK_FOLDERS, MAX_PATH_LENGTH, UPLOAD_CHUNK_SIZE
+from utils.file_manifest import ManifestBuilder, remove_line_index
 
 MAX_DEPTH = 5  
+UPLOAD_ID_LENGTH = 36  # len(str(uuid.uuid4()))
 
 def normalize_zip_path(zip_path):
     """Remove leading common folders from ZIP paths like __MACOSX/project/..."""
@@ -19,7 +23,11 @@ def looks_like_env(path_parts):
     return any(part in ENV_MARKERS for part in path_parts)
 
 def extract_zip(zip_path, extract_to):
-    extracted_files = []
+    """Extract the archive's code files; returns {full_path: manifest entry}.
+
+    Other members are skipped: nothing downstream reads them.
+    """
+    manifest = {}
 
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
         for member in zip_ref.infolist():
@@ -45,13 +53,75 @@ def extract_zip(zip_path, extract_to):
                 print(f"[SKIPPED] Binary file: {member.filename}")
                 continue
 
+            if not is_code_file(full_path):
+                continue
+
             os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            builder = ManifestBuilder(full_path, expected_size=member.file_size)
             with zip_ref.open(member) as source, open(full_path, "wb") as target:
-                target.write(source.read())
+                while True:
+                    chunk = source.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    builder.update(chunk)
+                    target.write(chunk)
+
+            manifest[full_path] = builder.finish()
 
-            extracted_files.append(member.filename)
+    return manifest
 
-    return extracted_files
+def write_chunk(f, builder, chunk):
+    builder.update(chunk)
+    f.write(chunk)
+
+async def save_upload_file(upload_file, dest_path, max_bytes, text=True):
+    """Stream an UploadFile to dest_path chunk by chunk, building its manifest as it goes.
+
+    Hashing and disk writes run in a thread so the event loop only waits on
+    the network. Returns the manifest entry (see utils.file_manifest; only
+    size and sha256 when text=False). Raises 413 and removes the partial file
+    as soon as more than max_bytes have been received.
+    """
+    builder = ManifestBuilder(dest_path, expected_size=getattr(upload_file, "size", None), text=text)
+    written = 0
+
+    try:
+        with open(dest_path, "wb") as f:
+            while True:
+                chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise HTTPException(status_code=413, detail="Upload exceeds the maximum allowed size.")
+                await asyncio.to_thread(write_chunk, f, builder, chunk)
+        return await asyncio.to_thread(builder.finish)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        remove_line_index(dest_path)
+        raise
+
+def source_path_from_relative(relative_name):
+    """Strip the per-upload file_id prefix from a temp-relative name.
+
+    "<file_id>/src/app.py" (zip member) -> "src/app.py"
+    "<file_id>_app.py" (plain file)     -> "app.py"
+    """
+    head, sep, rest = relative_name.partition("/")
+    if sep and len(head) == UPLOAD_ID_LENGTH:
+        return rest
+    if len(relative_name) > UPLOAD_ID_LENGTH and relative_name[UPLOAD_ID_LENGTH] == "_":
+        return relative_name[UPLOAD_ID_LENGTH + 1:]
+    return relative_name
+
+def normalize_source_path(path):
+    """Project-relative form of an upload or zip member name.
+
+    Forward slashes, no leading "./" or "/", no empty, "." or ".." segments.
+    """
+    parts = [part for part in str(path).strip().replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return "/".join(parts)
 
 def is_code_file(filepath):
     CODE_EXTENSIONS = [
@@ -0,0 +1,144 @@
+# utils/file_manifest.py
+
+import codecs
+import hashlib
+import io
+import mmap
+import os
+from array import array
+
+# Everything later stages need to know about an uploaded file, collected from
+# the chunks as they are written (upload stream or zip member), so the file
+# is not re-opened to hash it, sniff it or preview it:
+#
+#   size, sha256, encoding ("utf-8" or None), binary, line_count, preview,
+#   has_text (first MANIFEST_VALIDITY_CHARS are not blank), line_index
+#
+# Files of at least MANIFEST_MMAP_BYTES also get a line-offset index written
+# next to them (<path>.lines, shared with workers through TEMP_FOLDER); their
+# lines are then read from a memory map instead of being read() in one piece.
+MANIFEST_MMAP_BYTES = int(os.getenv("MANIFEST_MMAP_BYTES", 1024 * 1024))
+MANIFEST_PREVIEW_CHARS = 500
+MANIFEST_VALIDITY_CHARS = 1000
+LINE_INDEX_SUFFIX = ".lines"
+
+# Enough bytes for MANIFEST_VALIDITY_CHARS characters of UTF-8.
+_HEAD_BYTES = 4 * MANIFEST_VALIDITY_CHARS
+
+# Manifest fields carried in the analysis job payload (no preview).
+JOB_MANIFEST_FIELDS = ("size", "sha256", "encoding", "line_count", "line_index")
+
+
+class ManifestBuilder:
+    """Feed it every chunk written to `path`; finish() returns the manifest entry.
+
+    With text=False only size and sha256 are tracked (e.g. for zip archives).
+    """
+
+    def __init__(self, path, expected_size=None, text=True):
+        self.path = path
+        self.text = text
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.head = bytearray()
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.utf8 = True
+        self.has_nul = False
+        self.newlines = 0
+        self.last_byte = b""
+        self.offsets = array("Q", [0]) if text and (expected_size or 0) >= MANIFEST_MMAP_BYTES else None
+
+    def update(self, chunk):
+        self.sha256.update(chunk)
+        if self.text and chunk:
+            if len(self.head) < _HEAD_BYTES:
+                self.head += chunk[:_HEAD_BYTES - len(self.head)]
+            if self.utf8:
+                try:
+                    self.decoder.decode(chunk)
+                except UnicodeDecodeError:
+                    self.utf8 = False
+            if not self.has_nul and b"\x00" in chunk:
+                self.has_nul = True
+            if self.offsets is not None:
+                position = chunk.find(b"\n")
+                while position != -1:
+                    self.offsets.append(self.size + position + 1)
+                    position = chunk.find(b"\n", position + 1)
+            else:
+                self.newlines += chunk.count(b"\n")
+            self.last_byte = chunk[-1:]
+        self.size += len(chunk)
+
+    def finish(self):
+        entry = {"size": self.size, "sha256": self.sha256.hexdigest()}
+        if not self.text:
+            return entry
+
+        if self.utf8:
+            try:
+                self.decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                self.utf8 = False
+        head_text = bytes(self.head).decode("utf-8", errors="ignore")
+
+        line_index = None
+        if self.offsets is not None:
+            newlines = len(self.offsets) - 1
+            if self.size and self.last_byte != b"\n":
+                self.offsets.append(self.size)
+            line_index = self.path + LINE_INDEX_SUFFIX
+            with open(line_index, "wb") as f:
+                self.offsets.tofile(f)
+        else:
+            newlines = self.newlines
+
+        entry.update({
+            "encoding": "utf-8" if self.utf8 else None,
+            "binary": self.has_nul or not self.utf8,
+            "line_count": newlines + (1 if self.size and self.last_byte != b"\n" else 0),
+            "preview": head_text[:MANIFEST_PREVIEW_CHARS],
+            "has_text": bool(head_text[:MANIFEST_VALIDITY_CHARS].strip()),
+            "line_index": line_index
+        })
+        return entry
+
+
+def is_valid_code_entry(entry):
+    """Manifest equivalent of is_valid_code_file: readable text that isn't blank."""
+    return not entry["binary"] and entry["has_text"]
+
+
+def job_manifest(entry):
+    return {field: entry.get(field) for field in JOB_MANIFEST_FIELDS}
+
+
+def split_lines(text):
+    """Lines ending at "\n" only, ends kept: the rule line_count and the line index use."""
+    return io.StringIO(text, newline="\n").readlines()
+
+
+def read_lines(path, entry=None):
+    """The file's lines, ends kept; memory-mapped via the line index for large files."""
+    errors = "strict" if entry and entry.get("encoding") == "utf-8" else "replace"
+    line_index = entry.get("line_index") if entry else None
+
+    if line_index and os.path.exists(line_index):
+        offsets = array("Q")
+        with open(line_index, "rb") as f:
+            offsets.frombytes(f.read())
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return [
+                mapped[offsets[i]:offsets[i + 1]].decode("utf-8", errors)
+                for i in range(len(offsets) - 1)
+            ]
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    return split_lines(raw.decode("utf-8", errors))
+
+
+def remove_line_index(path):
+    index_path = path + LINE_INDEX_SUFFIX
+    if os.path.isfile(index_path):
+        os.remove(index_path)
@@ -0,0 +1,51 @@
+# utils/metrics.py
+
+import time
+from collections import defaultdict
+
+# Process-local counters and timings, exposed through GET /metrics.
+counters = defaultdict(int)
+gauges = {}
+timings = defaultdict(lambda: {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+
+
+def increment(name, value=1):
+    counters[name] += value
+
+
+def set_gauge(name, value):
+    gauges[name] = value
+
+
+def observe(name, seconds):
+    timing = timings[name]
+    timing["count"] += 1
+    timing["total_seconds"] += seconds
+    timing["max_seconds"] = max(timing["max_seconds"], seconds)
+
+
+class timed:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def snapshot():
+    return {
+        "counters": dict(counters),
+        "gauges": dict(gauges),
+        "timings": {
+            name: {
+                **timing,
+                "avg_seconds": timing["total_seconds"] / timing["count"] if timing["count"] else 0.0
+            }
+            for name, timing in timings.items()
+        }
+    }
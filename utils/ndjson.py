@@ -0,0 +1,40 @@
+# utils/ndjson.py
+
+import json
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request, format: str = None):
+    if format is not None:
+        if format not in ("json", "ndjson"):
+            raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'.")
+        return format == "ndjson"
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def ndjson_line(item):
+    return json.dumps(jsonable_encoder(item)) + "\n"
+
+
+def ndjson_response(items, headers=None):
+    """Stream an async iterable of JSON-serialisable items, one per line."""
+    async def body():
+        async for item in items:
+            yield ndjson_line(item)
+
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def parse_fields(fields, allowed):
+    """Turn a comma-separated fields= value into a list of allowed output keys."""
+    if not fields:
+        return list(allowed)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}.")
+    return requested
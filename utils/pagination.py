@@ -0,0 +1,28 @@
+# utils/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values):
+    """Opaque keyset cursor for the sort key of the last item on a page."""
+    encoded = [{"$dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong cursor size")
+        return [
+            datetime.fromisoformat(v["$dt"]) if isinstance(v, dict) and "$dt" in v else v
+            for v in values
+        ]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
@@ -0,0 +1,36 @@
+# worker.py — run with `python -m worker`
+
+import asyncio
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+from db.models import db
+from db.indexes import apply_indexes
+from services.job_queue import WORKER_ID, claim_job
+from routes.upload import run_analysis_job, fail_abandoned_jobs
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 2))
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", 2))
+
+
+async def worker_slot(slot):
+    while True:
+        job = await asyncio.to_thread(claim_job, WORKER_ID)
+        if job is None:
+            await fail_abandoned_jobs()
+            await asyncio.sleep(WORKER_POLL_SECONDS)
+            continue
+
+        print(f"[Worker {WORKER_ID}#{slot}] Claimed job for upload_id={job['upload_id']} (attempt {job['attempts']})")
+        await run_analysis_job(job, WORKER_ID)
+
+
+async def main():
+    print(f"[Worker {WORKER_ID}] Starting with {WORKER_CONCURRENCY} slot(s)")
+    await asyncio.to_thread(apply_indexes, db)
+    await asyncio.gather(*(worker_slot(i) for i in range(WORKER_CONCURRENCY)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())